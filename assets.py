@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class AssetManager:
+    # Loads assets on a background thread so the first frame never waits
+    # for disk or decoding. get() returns None until an asset is ready;
+    # callers treat that like a missing asset.
+    def __init__(self, workers=1):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._states = {}
+        self._errors = {}
+
+    def load(self, name, loader, *args):
+        with self._lock:
+            if name in self._states:
+                return
+            self._states[name] = PENDING
+        self._pool.submit(self._run, name, loader, args)
+
+    def _run(self, name, loader, args):
+        try:
+            asset = loader(*args)
+        except Exception as exc:
+            with self._lock:
+                self._errors[name] = exc
+                self._states[name] = FAILED
+            return
+        with self._lock:
+            self._assets[name] = asset
+            self._states[name] = READY
+
+    def state(self, name):
+        return self._states.get(name)
+
+    def ready(self, name):
+        return self._states.get(name) == READY
+
+    def get(self, name):
+        return self._assets.get(name)
+
+    def error(self, name):
+        return self._errors.get(name)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(1 for state in self._states.values() if state == PENDING)
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation import OBSTACLE_SPEED, OBSTACLE_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, TICK, Simulation
+
+DEFAULT_COUNTS = (10, 1000, 100000)
+DEFAULT_DRAW_COUNTS = (10, 1000)
+
+
+def populate(sim, count):
+    # Ceiling obstacles only, packed across the screen and beyond: the
+    # player sits on the floor, so the run never ends but the broad and
+    # narrow phases still see a full field.
+    sim.reset(seed=0)
+    sim.time_since_last_spawn = float("-inf")
+    spacing = max(1.0, 2 * SCREEN_WIDTH / count)
+    for i in range(count):
+        h = 50 + (i * 37) % 60
+        sim.obstacles.append(i * spacing, SCREEN_HEIGHT - h / 2, OBSTACLE_WIDTH, h, True, OBSTACLE_SPEED)
+    return spacing
+
+
+def top_up(sim, count, spacing):
+    obstacles = sim.obstacles
+    while len(obstacles) < count:
+        x = obstacles.live()[0][-1] + spacing if len(obstacles) else SCREEN_WIDTH
+        obstacles.append(x, SCREEN_HEIGHT - 40, OBSTACLE_WIDTH, 80, True, OBSTACLE_SPEED)
+
+
+def summarize(name, count, samples, allocs):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        "obstacles": count,
+        "frames": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p99_ms": ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+        "alloc_bytes_per_frame": statistics.fmean(allocs) if allocs else 0,
+    }
+
+
+def measure(fn, frames, before=None):
+    samples = []
+    for _ in range(frames):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    # Allocations are traced in a separate, shorter pass so tracemalloc's
+    # overhead does not leak into the timings.
+    allocs = []
+    tracemalloc.start()
+    for _ in range(min(frames, 100)):
+        if before is not None:
+            before()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        allocs.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return samples, allocs
+
+
+def bench_update(counts, frames):
+    results = []
+    for count in counts:
+        sim = Simulation()
+        spacing = populate(sim, count)
+
+        def refill():
+            top_up(sim, count, spacing)
+
+        samples, allocs = measure(lambda: sim.step(TICK), frames, refill)
+        results.append(summarize("step", count, samples, allocs))
+
+        def truncate():
+            sim.obstacles.truncate(count)
+
+        samples, allocs = measure(sim.spawn_obstacles_pair, frames, truncate)
+        results.append(summarize("spawn_obstacles_pair", count, samples, allocs))
+
+        samples, allocs = measure(lambda: sim._collides(TICK), frames)
+        results.append(summarize("collision", count, samples, allocs))
+    return results
+
+
+def bench_draw(counts, frames):
+    os.environ.setdefault("ARCADE_HEADLESS", "1")
+    from main import GameState, GravityCubeGame
+
+    data_dir = tempfile.TemporaryDirectory()
+    window = GravityCubeGame(data_dir=data_dir.name)
+    ctx = window.ctx
+    results = []
+
+    def timed(draw):
+        def frame():
+            window.clear()
+            draw()
+            ctx.finish()
+
+        return frame
+
+    for name, state, draw in (
+        ("draw_menu", GameState.MENU, window.draw_menu),
+        ("draw_skins_menu", GameState.SKINS, window.draw_skins_menu),
+    ):
+        window.state = state
+        samples, allocs = measure(timed(draw), frames)
+        results.append(summarize(name, 0, samples, allocs))
+
+    for count in counts:
+        window.state = GameState.GAME
+        spacing = populate(window.simulation, count)
+        sim = window.simulation
+
+        def advance():
+            sim.step(TICK)
+            top_up(sim, count, spacing)
+
+        for name, draw in (
+            ("draw_game", window.draw_game),
+            ("draw_pause_overlay", lambda: (window.draw_game(), window.draw_pause_overlay())),
+            ("draw_game_over_overlay", lambda: (window.draw_game(), window.draw_game_over_overlay())),
+        ):
+            samples, allocs = measure(timed(draw), frames, advance)
+            results.append(summarize(name, count, samples, allocs))
+
+    window.close()
+    data_dir.cleanup()
+    return results
+
+
+def bench_stress(budget_ms, max_frames):
+    # Plays the stress preset (no collisions, density rising with score)
+    # one tick per frame and reports the live obstacle count at which the
+    # median of the last second of frames first exceeds the budget.
+    os.environ.setdefault("ARCADE_HEADLESS", "1")
+    from main import GravityCubeGame
+
+    data_dir = tempfile.TemporaryDirectory()
+    window = GravityCubeGame(mode="stress", data_dir=data_dir.name)
+    window.setup_game()
+    sim = window.simulation
+    recent = []
+    curve = []
+    broke_at = None
+    for frame in range(max_frames):
+        start = time.perf_counter()
+        window.on_update(TICK)
+        window.on_draw()
+        window.ctx.finish()
+        recent.append((time.perf_counter() - start) * 1000)
+        if len(recent) > 60:
+            recent.pop(0)
+        if frame % 60 == 59:
+            median = statistics.median(recent)
+            curve.append({"frame": frame + 1, "obstacles": len(sim.obstacles), "median_ms": median})
+            if median > budget_ms:
+                broke_at = len(sim.obstacles)
+                break
+    window.close()
+    data_dir.cleanup()
+    return {"budget_ms": budget_ms, "broke_at_obstacles": broke_at, "curve": curve}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark StickyCubes update and draw paths.")
+    parser.add_argument("--counts", type=int, nargs="+", default=list(DEFAULT_COUNTS), help="obstacle counts to test")
+    parser.add_argument(
+        "--draw-counts", type=int, nargs="+", default=list(DEFAULT_DRAW_COUNTS), help="obstacle counts for draw_game"
+    )
+    parser.add_argument("--frames", type=int, default=600, help="frames timed per case")
+    parser.add_argument("--no-draw", action="store_true", help="skip the headless GL draw benchmarks")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--stress", action="store_true", help="ramp the stress preset until frames miss the budget")
+    parser.add_argument("--budget-ms", type=float, default=1000 / 60, help="frame budget for --stress")
+    parser.add_argument("--stress-frames", type=int, default=36000, help="give up on --stress after this many frames")
+    args = parser.parse_args(argv)
+
+    results = bench_update(args.counts, args.frames)
+    if not args.no_draw:
+        results += bench_draw(args.draw_counts, args.frames)
+    stress = bench_stress(args.budget_ms, args.stress_frames) if args.stress else None
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "frames": args.frames,
+        "results": results,
+    }
+    if stress is not None:
+        report["stress"] = stress
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for r in results:
+        print(f"{r['name']:<24} {r['obstacles']:>7}  mean {r['mean_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms")
+    if stress is not None:
+        for point in stress["curve"][:: max(1, len(stress["curve"]) // 10)]:
+            print(f"stress frame {point['frame']:>6}  {point['obstacles']:>6} obstacles  {point['median_ms']:7.2f} ms")
+        if stress["broke_at_obstacles"] is None:
+            print(f"stress: stayed under {args.budget_ms:.1f} ms for {args.stress_frames} frames")
+        else:
+            print(f"stress: over {args.budget_ms:.1f} ms at {stress['broke_at_obstacles']} obstacles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
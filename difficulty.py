@@ -0,0 +1,48 @@
+from bisect import bisect_right
+
+
+class DifficultyCurve:
+    # Piecewise-linear in score: each point is (score, spawn interval in
+    # seconds, obstacle speed in px/s). Past the last point its values hold.
+    def __init__(self, points, collisions=True):
+        self.points = sorted(points)
+        self.scores = [p[0] for p in self.points]
+        self.collisions = collisions
+
+    def at(self, score):
+        i = bisect_right(self.scores, score)
+        if i == 0:
+            return self.points[0][1:]
+        if i == len(self.points):
+            return self.points[-1][1:]
+        s0, interval0, speed0 = self.points[i - 1]
+        s1, interval1, speed1 = self.points[i]
+        f = (score - s0) / (s1 - s0)
+        return interval0 + (interval1 - interval0) * f, speed0 + (speed1 - speed0) * f
+
+
+ENDLESS = DifficultyCurve(
+    [
+        (0, 2.4, 120),
+        (10, 1.6, 160),
+        (30, 1.0, 220),
+        (60, 0.6, 280),
+        (120, 0.35, 340),
+        (250, 0.2, 400),
+    ]
+)
+
+# Not meant to be played: collisions are off so the run never ends, and
+# density keeps rising with the score until the frame budget gives out.
+STRESS = DifficultyCurve(
+    [
+        (0, 0.05, 300),
+        (500, 0.01, 450),
+        (5000, 0.002, 600),
+        (50000, 0.0005, 800),
+    ],
+    collisions=False,
+)
+
+MODES = {"classic": None, "endless": ENDLESS, "stress": STRESS}
+MODE_NAMES = tuple(MODES)
@@ -0,0 +1,354 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import (
+    FLIP,
+    FLIP_BUFFER,
+    GRAVITY_BOTTOM_Y,
+    GRAVITY_TOP_Y,
+    OBSTACLE_MAX_HEIGHT,
+    OBSTACLE_MIN_HEIGHT,
+    OBSTACLE_SPAWN_INTERVAL,
+    OBSTACLE_SPEED,
+    OBSTACLE_WIDTH,
+    PLAYER_SIZE,
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+    TICK_RATE,
+    GravityDirection,
+    Simulation,
+)
+
+NOOP = 0
+FLIP_ACTION = 1
+
+LOOKAHEAD = 3
+OBSTACLE_FEATURES = 3
+GROUND_SNAP = 4
+
+
+def observation_size(lookahead=LOOKAHEAD):
+    return 2 + OBSTACLE_FEATURES * lookahead
+
+
+def observe(player_x, player_y, up, ob_x, ob_h, ob_top, ob_alive, lookahead):
+    # Row layout: player y / height, gravity (+1 up, -1 down), then for the
+    # next `lookahead` obstacles not yet behind the player: distance / width,
+    # height / screen height, side (+1 ceiling, -1 floor). Missing obstacles
+    # read as (1, 0, 0).
+    n = len(player_y)
+    obs = np.zeros((n, observation_size(lookahead)), dtype=np.float32)
+    obs[:, 0] = player_y / SCREEN_HEIGHT
+    obs[:, 1] = np.where(up, 1.0, -1.0)
+
+    ahead = ob_alive & (ob_x + OBSTACLE_WIDTH / 2 >= player_x - PLAYER_SIZE / 2)
+    key = np.where(ahead, ob_x, np.inf)
+    k = min(lookahead, key.shape[1])
+    order = np.argsort(key, axis=1)[:, :k]
+    xs = np.take_along_axis(key, order, axis=1)
+    present = np.isfinite(xs)
+    dx = obs[:, 2::OBSTACLE_FEATURES]
+    dx[:] = 1.0
+    dx[:, :k] = np.where(present, (xs - player_x) / SCREEN_WIDTH, 1.0)
+    obs[:, 3 : 3 + OBSTACLE_FEATURES * k : OBSTACLE_FEATURES] = np.where(
+        present, np.take_along_axis(ob_h, order, axis=1) / SCREEN_HEIGHT, 0.0
+    )
+    obs[:, 4 : 4 + OBSTACLE_FEATURES * k : OBSTACLE_FEATURES] = np.where(
+        present, np.where(np.take_along_axis(ob_top, order, axis=1), 1.0, -1.0), 0.0
+    )
+    return obs
+
+
+class GravityCubeEnv:
+    # Gym-style wrapper around one Simulation: reset() -> (obs, info),
+    # step(action) -> (obs, reward, terminated, truncated, info). The reward
+    # is the number of obstacles passed during the tick.
+    def __init__(
+        self, seed=None, lookahead=LOOKAHEAD, max_ticks=None, tick_rate=TICK_RATE, mode="classic", flip_buffer=FLIP_BUFFER
+    ):
+        self.simulation = Simulation(seed, tick_rate, mode, flip_buffer)
+        self.lookahead = lookahead
+        self.max_ticks = max_ticks
+
+    def reset(self, seed=None):
+        self.simulation.reset(seed)
+        return self._observe(), {"seed": self.simulation.seed}
+
+    def step(self, action):
+        sim = self.simulation
+        score = sim.score
+        sim.step(sim.tick_dt, (FLIP,) if action else ())
+        truncated = self.max_ticks is not None and sim.tick >= self.max_ticks
+        return self._observe(), sim.score - score, sim.crashed, truncated, {"score": sim.score, "tick": sim.tick}
+
+    def _observe(self):
+        sim = self.simulation
+        x, y, w, h, top, speed = sim.obstacles.live()
+        return observe(
+            sim.player_x,
+            np.array([sim.player_y]),
+            np.array([sim.gravity == GravityDirection.UP]),
+            x[None],
+            h[None],
+            top[None],
+            np.ones((1, len(x)), dtype=bool),
+            self.lookahead,
+        )[0]
+
+
+class BatchEnv:
+    # N independent classic-mode games stepped in lockstep. The rules match
+    # Simulation (closed-form vertical motion, swept collision, fixed tick)
+    # but every piece of state is an array over games, and obstacles live in
+    # a few fixed slots per game since one speed keeps at most a handful on
+    # screen.
+    # Finished games are reset in place; their scores come back in
+    # info["final_score"].
+    def __init__(
+        self, num_envs, seed=None, lookahead=LOOKAHEAD, max_ticks=None, tick_rate=TICK_RATE, flip_buffer=FLIP_BUFFER
+    ):
+        reference = Simulation(0, tick_rate, flip_buffer=flip_buffer)
+        self.num_envs = num_envs
+        self.lookahead = lookahead
+        self.max_ticks = max_ticks
+        self.tick_dt = reference.tick_dt
+        self.switch_cooldown = reference.switch_cooldown
+        self.hitbox_scale = reference.hitbox_scale
+        self.flip_buffer = reference.flip_buffer
+        self.player_x = reference.player_x
+        solver = reference.vertical
+        self.acceleration = solver.acceleration
+        self.reference_dt = solver.reference_dt
+        self.snap_eps = solver.snap_eps
+        self.rng = np.random.default_rng(seed)
+
+        slots = int((SCREEN_WIDTH + OBSTACLE_WIDTH) / (OBSTACLE_SPEED * OBSTACLE_SPAWN_INTERVAL)) + 2
+        shape = (num_envs, slots)
+        self.ob_x = np.zeros(shape)
+        self.ob_y = np.zeros(shape)
+        self.ob_h = np.zeros(shape)
+        self.ob_top = np.zeros(shape, dtype=bool)
+        self.ob_alive = np.zeros(shape, dtype=bool)
+
+        self.time = np.zeros(num_envs)
+        self.t0 = np.zeros(num_envs)
+        self.y0 = np.zeros(num_envs)
+        self.v0 = np.zeros(num_envs)
+        self.direction = np.zeros(num_envs)
+        self.target = np.zeros(num_envs)
+        self.land_time = np.zeros(num_envs)
+        self.up = np.zeros(num_envs, dtype=bool)
+        self.player_y = np.zeros(num_envs)
+        self.since_switch = np.zeros(num_envs)
+        self.since_spawn = np.zeros(num_envs)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.tick = np.zeros(num_envs, dtype=np.int64)
+        # Time of each game's queued flip request; NaN when none is queued.
+        self.flip_requested = np.full(num_envs, np.nan)
+        self._reset_games(np.ones(num_envs, dtype=bool))
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_games(np.ones(self.num_envs, dtype=bool))
+        return self._observe(), {}
+
+    def _reset_games(self, mask):
+        for arr in (self.time, self.t0, self.v0, self.direction, self.land_time, self.since_switch, self.since_spawn):
+            arr[mask] = 0.0
+        for arr in (self.y0, self.target, self.player_y):
+            arr[mask] = GRAVITY_BOTTOM_Y
+        self.up[mask] = False
+        self.score[mask] = 0
+        self.tick[mask] = 0
+        self.flip_requested[mask] = np.nan
+        self.ob_alive[mask] = False
+
+    def step(self, actions):
+        dt = self.tick_dt
+        self.tick += 1
+
+        y = self.player_y
+        act = np.asarray(actions, dtype=bool)
+        requested = self.flip_requested
+        requested[act] = self.time[act]
+        queued = ~np.isnan(requested)
+        flip = queued & (self.since_switch >= self.switch_cooldown)
+        flip &= (np.abs(y - GRAVITY_BOTTOM_Y) <= GROUND_SNAP) | (np.abs(y - GRAVITY_TOP_Y) <= GROUND_SNAP)
+        if flip.any():
+            self._launch(flip)
+        requested[flip | (queued & (self.time - requested >= self.flip_buffer))] = np.nan
+        self.since_switch += dt
+
+        self.time += dt
+        self.player_y = self._y_at(self.time)
+
+        self.ob_x -= OBSTACLE_SPEED * dt
+        passed = self.ob_alive & (self.ob_x + OBSTACLE_WIDTH / 2 < 0)
+        self.ob_alive &= ~passed
+        reward = np.count_nonzero(passed, axis=1)
+        self.score += reward
+
+        # Spawn after the scroll, as Simulation does, so new obstacles are
+        # not moved twice in the tick they appear.
+        self.since_spawn += dt
+        due = self.since_spawn >= OBSTACLE_SPAWN_INTERVAL
+        while due.any():
+            self.since_spawn[due] -= OBSTACLE_SPAWN_INTERVAL
+            self._spawn(due)
+            due = self.since_spawn >= OBSTACLE_SPAWN_INTERVAL
+
+        terminated = self._collides(dt)
+        if self.max_ticks is not None:
+            truncated = (self.tick >= self.max_ticks) & ~terminated
+        else:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        done = terminated | truncated
+        info = {}
+        if done.any():
+            info["final_score"] = np.where(done, self.score, 0)
+            info["final_tick"] = np.where(done, self.tick, 0)
+            self._reset_games(done)
+        return self._observe(), reward, terminated, truncated, info
+
+    def _y_at(self, t, rows=slice(None)):
+        tau = t - self.t0[rows]
+        a = self.direction[rows] * self.acceleration
+        y = self.y0[rows] + (self.v0[rows] + a * self.reference_dt / 2) * tau + a * tau * tau / 2
+        return np.where(t >= self.land_time[rows], self.target[rows], y)
+
+    def _launch(self, mask):
+        rows = np.flatnonzero(mask)
+        t = self.time[rows]
+        y = self._y_at(t, rows)
+        v = np.where(t >= self.land_time[rows], 0.0, self.v0[rows] + self.direction[rows] * self.acceleration * (t - self.t0[rows]))
+
+        up = ~self.up[rows]
+        d = np.where(up, 1.0, -1.0)
+        target = np.where(up, GRAVITY_TOP_Y, GRAVITY_BOTTOM_Y)
+        heading_in = v * d < 0
+        nearer = np.where(y - GRAVITY_BOTTOM_Y <= GRAVITY_TOP_Y - y, GRAVITY_BOTTOM_Y, GRAVITY_TOP_Y)
+        y = np.where(heading_in, nearer, y)
+        v = np.where(heading_in, 0.0, v)
+
+        a = self.acceleration
+        distance = np.maximum(d * (target - d * self.snap_eps - y), 0.0)
+        u = d * v + a * self.reference_dt / 2
+        self.land_time[rows] = t + (-u + np.sqrt(u * u + 2 * a * distance)) / a
+        self.up[rows] = up
+        self.t0[rows] = t
+        self.y0[rows] = y
+        self.v0[rows] = v
+        self.direction[rows] = d
+        self.target[rows] = target
+        self.since_switch[rows] = 0.0
+
+    def _spawn(self, mask):
+        rows = np.flatnonzero(mask)
+        slot = np.argmin(self.ob_alive[rows], axis=1)
+        height = self.rng.integers(OBSTACLE_MIN_HEIGHT, OBSTACLE_MAX_HEIGHT + 1, size=len(rows))
+        top = self.rng.random(len(rows)) < 0.5
+        self.ob_x[rows, slot] = SCREEN_WIDTH + OBSTACLE_WIDTH / 2 - OBSTACLE_SPEED * self.since_spawn[rows]
+        self.ob_y[rows, slot] = np.where(top, SCREEN_HEIGHT - height / 2, height / 2)
+        self.ob_h[rows, slot] = height
+        self.ob_top[rows, slot] = top
+        self.ob_alive[rows, slot] = True
+
+    def _collides(self, dt):
+        # Same swept test as ObstacleStore.sweep, over every slot at once.
+        half = PLAYER_SIZE * self.hitbox_scale / 2
+        ob_half_w = OBSTACLE_WIDTH * self.hitbox_scale / 2
+        since_enter = np.minimum((self.player_x + half + ob_half_w - self.ob_x) / OBSTACLE_SPEED, dt)
+        since_exit = np.maximum((self.player_x - half - ob_half_w - self.ob_x) / OBSTACLE_SPEED, 0.0)
+        crashed = np.zeros(self.num_envs, dtype=bool)
+        rows, cols = np.nonzero(self.ob_alive & (since_exit <= since_enter))
+        if not len(rows):
+            return crashed
+
+        now = self.time[rows]
+        y_enter = self._y_at(now - since_enter[rows, cols], rows)
+        y_exit = self._y_at(now - since_exit[rows, cols], rows)
+        player_bottom = np.minimum(y_enter, y_exit) - half
+        player_top = np.maximum(y_enter, y_exit) + half
+        y = self.ob_y[rows, cols]
+        ob_half_h = self.ob_h[rows, cols] * (self.hitbox_scale / 2)
+        hit = (player_top >= y - ob_half_h) & (player_bottom <= y + ob_half_h)
+        crashed[rows[hit]] = True
+        return crashed
+
+    def _observe(self):
+        return observe(
+            self.player_x, self.player_y, self.up, self.ob_x, self.ob_h, self.ob_top, self.ob_alive, self.lookahead
+        )
+
+
+def dodge_policy(obs):
+    # Baseline bot: flip away when the nearest obstacle is on our side and close.
+    return (obs[:, 4] == obs[:, 1]) & (obs[:, 2] < 0.12)
+
+
+def _run_batch(job):
+    policy, num_envs, ticks, seed, lookahead = job
+    env = BatchEnv(num_envs, seed=seed, lookahead=lookahead)
+    obs, _ = env.reset()
+    episodes = 0
+    score_sum = 0
+    best = 0
+    for _ in range(ticks):
+        obs, _, terminated, truncated, info = env.step(policy(obs))
+        if "final_score" in info:
+            done = terminated | truncated
+            scores = info["final_score"][done]
+            episodes += len(scores)
+            score_sum += int(scores.sum())
+            best = max(best, int(scores.max()))
+    # Games still running at the end count as runs cut off at `ticks`.
+    episodes += num_envs
+    score_sum += int(env.score.sum())
+    best = max(best, int(env.score.max()))
+    return {"ticks": num_envs * ticks, "episodes": episodes, "score_sum": score_sum, "best": best}
+
+
+def run_pool(policy, num_envs, ticks, workers=None, seed=None, lookahead=LOOKAHEAD):
+    # The policy must be a picklable top-level function of an (n, obs) array.
+    workers = min(workers or os.cpu_count() or 1, num_envs)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [num_envs // workers + (i < num_envs % workers) for i in range(workers)]
+    jobs = [(policy, size, ticks, s, lookahead) for size, s in zip(sizes, seeds)]
+    if workers == 1:
+        results = [_run_batch(jobs[0])]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_run_batch, jobs))
+    total = {"ticks": 0, "episodes": 0, "score_sum": 0, "best": 0}
+    for r in results:
+        for key in ("ticks", "episodes", "score_sum"):
+            total[key] += r[key]
+        total["best"] = max(total["best"], r["best"])
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a StickyCubes bot over many headless games.")
+    parser.add_argument("--envs", type=int, default=4096, help="games stepped in lockstep, split across workers")
+    parser.add_argument("--ticks", type=int, default=3600, help="ticks per game slot")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    total = run_pool(dodge_policy, args.envs, args.ticks, workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    mean = total["score_sum"] / total["episodes"] if total["episodes"] else 0.0
+    print(f"{total['ticks']} ticks in {elapsed:.2f} s ({total['ticks'] / elapsed / 1e6:.2f} M ticks/s)")
+    print(f"{total['episodes']} runs, mean score {mean:.2f}, best {total['best']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
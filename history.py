@@ -0,0 +1,350 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from bisect import insort
+
+import numpy as np
+
+from difficulty import MODE_NAMES
+from storage import BackgroundWriter, encode_save, read_save, write_atomic
+
+MAGIC = b"SCRH"
+VERSION = 1
+HEADER = struct.Struct("<4sBxHQ")
+# timestamp (ms), seed, score, duration (ms), skin, mode, then a CRC32 of
+# the bytes before it.
+RECORD = struct.Struct("<QQIIHBxI")
+RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", "<u8"),
+        ("seed", "<u8"),
+        ("score", "<u4"),
+        ("duration_ms", "<u4"),
+        ("skin", "<u2"),
+        ("mode", "u1"),
+        ("pad", "u1"),
+        ("crc", "<u4"),
+    ]
+)
+CHECKED = RECORD.size - 4
+
+TOP_SIZE = 100
+SKIN_TOP_SIZE = 10
+
+
+def _pack(timestamp, seed, score, duration_ms, skin, mode):
+    body = RECORD.pack(timestamp, seed, score, duration_ms, skin, mode, 0)[:CHECKED]
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _insert(top, score, record, size):
+    # Best first; equal scores keep the earlier run ahead.
+    insort(top, (-score, record))
+    if len(top) > size:
+        top.pop()
+
+
+class RunHistory:
+    # Every finished run as a 32-byte record appended to one file; reads go
+    # through a memory map. A small index (global top-N, per-skin totals and
+    # top lists) lives next to it and is written on close, so recording is
+    # a single append and opening only reads the index plus whatever was
+    # appended after it was last written.
+    def __init__(self, path, top_size=TOP_SIZE, skin_top_size=SKIN_TOP_SIZE):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.top_size = top_size
+        self.skin_top_size = skin_top_size
+        self._map = None
+        self._records = None
+        self._open()
+        if not self._load_index():
+            self._rebuild_index()
+
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            generation = int.from_bytes(os.urandom(8), "little")
+            with open(self.path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, generation))
+        self.file = open(self.path, "r+b")
+        magic, version, record_size, self.generation = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            # Like an unreadable save, a broken history is not fatal: it is
+            # set aside as .bad and a new one is started.
+            self.file.close()
+            os.replace(self.path, self.path + ".bad")
+            self._open()
+            return
+        # A torn record from an interrupted write is cut off.
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = (size - HEADER.size) // RECORD.size
+        end = HEADER.size + self.count * RECORD.size
+        if size != end:
+            self.file.truncate(end)
+        self.file.seek(end)
+
+    def __len__(self):
+        return self.count
+
+    def _view(self):
+        # The map is made again only after the file has grown.
+        if self._records is None or len(self._records) != self.count:
+            # The old map is left to close once nothing refers to it.
+            if self.count:
+                self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=self.count, offset=HEADER.size)
+            else:
+                self._records = np.zeros(0, dtype=RECORD_DTYPE)
+        return self._records
+
+    def _valid(self, i):
+        start = HEADER.size + i * RECORD.size
+        data = self._map[start : start + RECORD.size]
+        return zlib.crc32(data[:CHECKED]) == RECORD.unpack(data)[-1]
+
+    def record(self, score, duration, skin, mode="classic", seed=0, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.file.write(
+            _pack(int(timestamp * 1000), seed, score, round(duration * 1000), skin, MODE_NAMES.index(mode))
+        )
+        self.file.flush()
+        i = self.count
+        self.count += 1
+        self._add_to_index(i, score, round(duration * 1000), skin)
+        return i
+
+    def _add_to_index(self, i, score, duration_ms, skin):
+        _insert(self.top_runs, score, i, self.top_size)
+        stats = self.skins.setdefault(skin, {"runs": 0, "score": 0, "duration_ms": 0, "top": []})
+        stats["runs"] += 1
+        stats["score"] += score
+        stats["duration_ms"] += duration_ms
+        _insert(stats["top"], score, i, self.skin_top_size)
+
+    def run(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        records = self._view()
+        if not self._valid(i):
+            return None
+        r = records[i]
+        return {
+            "index": i,
+            "timestamp": int(r["timestamp"]) / 1000,
+            "seed": int(r["seed"]),
+            "score": int(r["score"]),
+            "duration": int(r["duration_ms"]) / 1000,
+            "skin": int(r["skin"]),
+            "mode": MODE_NAMES[r["mode"]] if r["mode"] < len(MODE_NAMES) else None,
+        }
+
+    def _runs(self, indices, n):
+        runs = []
+        for i in indices:
+            run = self.run(int(i))
+            if run is not None:
+                runs.append(run)
+                if len(runs) == n:
+                    break
+        return runs
+
+    def top(self, n=10, skin=None):
+        if skin is None:
+            top, size = self.top_runs, self.top_size
+        else:
+            stats = self.skins.get(skin)
+            if stats is None:
+                return []
+            top, size = stats["top"], self.skin_top_size
+        runs = self._runs((i for _, i in top), n)
+        if len(runs) == n or len(top) < size:
+            return runs
+        # Past what the index keeps: sort the mapped scores instead.
+        records = self._view()
+        order = np.argsort(-records["score"].astype(np.int64), kind="stable")
+        if skin is not None:
+            order = order[records["skin"][order] == skin]
+        return self._runs(order, n)
+
+    def recent(self, n=10):
+        return self._runs(range(self.count - 1, -1, -1), n)
+
+    def skin_stats(self, skin):
+        stats = self.skins.get(skin)
+        if stats is None:
+            return {"runs": 0, "best": 0, "mean_score": 0.0, "total_duration": 0.0}
+        best = self._runs((i for _, i in stats["top"]), 1)
+        return {
+            "runs": stats["runs"],
+            "best": best[0]["score"] if best else 0,
+            "mean_score": stats["score"] / stats["runs"],
+            "total_duration": stats["duration_ms"] / 1000,
+        }
+
+    def _load_index(self):
+        data = read_save(self.index_path)
+        if data is None or data.get("version") != VERSION or data.get("generation") != self.generation:
+            return False
+        covered = data.get("records")
+        if not isinstance(covered, int) or not 0 <= covered <= self.count:
+            return False
+        if data.get("top_size") != self.top_size or data.get("skin_top_size") != self.skin_top_size:
+            return False
+        try:
+            self.top_runs = [tuple(entry) for entry in data["top"]]
+            self.skins = {
+                int(skin): dict(stats, top=[tuple(entry) for entry in stats["top"]])
+                for skin, stats in data["skins"].items()
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return False
+        self._index_from(covered)
+        return True
+
+    def _rebuild_index(self):
+        self.top_runs = []
+        self.skins = {}
+        self._index_from(0)
+
+    def _index_from(self, start):
+        # Only runs appended since the index was written are read here. The
+        # checksums are checked one by one; everything else is vectorised.
+        records = self._view()
+        valid = np.fromiter((self._valid(i) for i in range(start, self.count)), dtype=bool, count=self.count - start)
+        rows = np.flatnonzero(valid) + start
+        if not len(rows):
+            return
+        scores = records["score"][rows].astype(np.int64)
+        skins = records["skin"][rows]
+        durations = records["duration_ms"][rows].astype(np.int64)
+        order = np.lexsort((rows, -scores))
+        for j in order[: self.top_size]:
+            _insert(self.top_runs, int(scores[j]), int(rows[j]), self.top_size)
+        for skin in np.unique(skins):
+            mine = skins == skin
+            stats = self.skins.setdefault(int(skin), {"runs": 0, "score": 0, "duration_ms": 0, "top": []})
+            stats["runs"] += int(np.count_nonzero(mine))
+            stats["score"] += int(scores[mine].sum())
+            stats["duration_ms"] += int(durations[mine].sum())
+            for j in order[mine[order]][: self.skin_top_size]:
+                _insert(stats["top"], int(scores[j]), int(rows[j]), self.skin_top_size)
+
+    def save_index(self):
+        data = {
+            "version": VERSION,
+            "generation": self.generation,
+            "records": self.count,
+            "top_size": self.top_size,
+            "skin_top_size": self.skin_top_size,
+            "top": self.top_runs,
+            "skins": {str(skin): stats for skin, stats in self.skins.items()},
+        }
+        return write_atomic(self.index_path, encode_save(data))
+
+    def compact(self, keep_recent=None):
+        # Rewrites the log without corrupt records and, with keep_recent,
+        # without older runs that are in neither the global nor a per-skin
+        # top list. Record numbers change, so the index is rebuilt.
+        records = self._view()
+        keep = [i for i in range(self.count) if self._valid(i)]
+        if keep_recent is not None:
+            ranked = {i for _, i in self.top_runs}
+            for stats in self.skins.values():
+                ranked.update(i for _, i in stats["top"])
+            first = self.count - keep_recent
+            keep = [i for i in keep if i >= first or i in ranked]
+        data = records[np.asarray(keep, dtype=np.int64)].tobytes()
+        del records
+        generation = int.from_bytes(os.urandom(8), "little")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, generation))
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_file()
+        os.replace(tmp_path, self.path)
+        self._open()
+        self._rebuild_index()
+        self.save_index()
+        return len(keep)
+
+    def _close_file(self):
+        self._records = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+    def close(self):
+        self.save_index()
+        self._close_file()
+
+
+class HistoryWriter(BackgroundWriter):
+    # Opens the history and appends to it on a background thread, so the
+    # game loop never waits on the disk. Runs submitted before the file is
+    # open just queue up.
+    def __init__(self, path):
+        self.path = path
+        self._history = None
+        super().__init__("history-writer")
+
+    def submit(self, score, duration, skin, mode="classic", seed=0):
+        self._submit((score, duration, skin, mode, seed, time.time()))
+
+    def _start(self):
+        try:
+            self._history = RunHistory(self.path)
+        except OSError:
+            self._history = None
+
+    def _write(self, runs):
+        if self._history is None:
+            return
+        try:
+            for score, duration, skin, mode, seed, timestamp in runs:
+                self._history.record(score, duration, skin, mode, seed, timestamp)
+        except OSError:
+            self._history = None
+
+    def _finish(self):
+        if self._history is None:
+            return
+        try:
+            self._history.close()
+        except OSError:
+            self._history = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or compact a StickyCubes run history.")
+    parser.add_argument("path", help="run history file")
+    parser.add_argument("--top", type=int, default=10, help="how many runs to list")
+    parser.add_argument("--skin", type=int, help="only runs with this skin")
+    parser.add_argument("--compact", action="store_true", help="drop corrupt records and rewrite the file")
+    parser.add_argument("--keep-recent", type=int, help="with --compact, also drop old runs outside the top lists")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    history = RunHistory(args.path)
+    print(f"{len(history)} runs, opened in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if args.compact:
+        print(f"compacted to {history.compact(args.keep_recent)} runs")
+    for place, run in enumerate(history.top(args.top, args.skin), 1):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["timestamp"]))
+        print(f"{place:3}. {run['score']:6}  {run['duration']:7.1f} s  skin {run['skin']}  {run['mode']}  {when}")
+    if args.skin is not None:
+        stats = history.skin_stats(args.skin)
+        print(f"skin {args.skin}: {stats['runs']} runs, best {stats['best']}, mean {stats['mean_score']:.1f}")
+    history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+
+class InputQueue:
+    # Clicks are stamped with perf_counter() as the window receives them and
+    # handed to the simulation on the next update. Stamps wait until the
+    # flip they asked for shows up on screen (or is dropped for arriving too
+    # early), giving one input-to-photon sample per flip.
+    def __init__(self, capacity=240):
+        self.events = []
+        self.waiting = []
+        self.flipped = False
+        self.latencies = np.zeros(capacity)
+        self.index = 0
+        self.filled = 0
+        self.dropped = 0
+        self.buffered = 0
+
+    def push(self, action, stamp=None):
+        self.events.append((action, time.perf_counter() if stamp is None else stamp))
+
+    def drain(self):
+        # Actions for the next tick; the stamps move to waiting. Only call
+        # it when a tick is about to run.
+        actions = [action for action, _ in self.events]
+        self.waiting.extend(stamp for _, stamp in self.events)
+        self.events.clear()
+        return actions
+
+    def clear(self):
+        self.events.clear()
+        self.waiting.clear()
+        self.flipped = False
+
+    def resolve(self, flipped, buffered, dropped):
+        # Called after the simulation advanced with what the last flip
+        # request turned into.
+        self.buffered += buffered
+        if flipped:
+            self.flipped = True
+        elif dropped:
+            self.dropped += dropped
+            self.waiting.clear()
+
+    def presented(self, now=None):
+        # Called once the frame showing the flip has been drawn. Clicks
+        # merged into one request count from the earliest.
+        if not self.flipped:
+            return
+        self.flipped = False
+        if not self.waiting:
+            return
+        now = time.perf_counter() if now is None else now
+        self.latencies[self.index] = now - self.waiting[0]
+        self.waiting.clear()
+        self.index = (self.index + 1) % len(self.latencies)
+        self.filled = min(self.filled + 1, len(self.latencies))
+
+    def stats(self):
+        if not self.filled:
+            return None
+        samples = self.latencies[: self.filled]
+        p50, p95 = np.percentile(samples, (50, 95))
+        return {
+            "samples": self.filled,
+            "mean_ms": float(samples.mean()) * 1000,
+            "p50_ms": float(p50) * 1000,
+            "p95_ms": float(p95) * 1000,
+            "max_ms": float(samples.max()) * 1000,
+            "buffered": self.buffered,
+            "dropped": self.dropped,
+        }
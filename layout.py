@@ -0,0 +1,111 @@
+import math
+
+
+class Rect:
+    __slots__ = ("cx", "cy", "left", "right", "bottom", "top")
+
+    def __init__(self, cx, cy, w, h):
+        self.cx = cx
+        self.cy = cy
+        self.left = cx - w / 2
+        self.right = cx + w / 2
+        self.bottom = cy - h / 2
+        self.top = cy + h / 2
+
+    def contains(self, x, y):
+        return self.left <= x <= self.right and self.bottom <= y <= self.top
+
+
+class Letterbox:
+    # Fits the fixed logical canvas into a window of any size at its own
+    # aspect ratio, centred with bars on the long side. Window coordinates
+    # (mouse events) map back to logical ones with to_logical().
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fit(width, height)
+
+    def fit(self, window_width, window_height):
+        self.scale = min(window_width / self.width, window_height / self.height)
+        self.left = (window_width - self.width * self.scale) / 2
+        self.bottom = (window_height - self.height * self.scale) / 2
+
+    def viewport(self, pixel_ratio=1.0):
+        # (x, y, width, height) in framebuffer pixels.
+        scale = self.scale * pixel_ratio
+        left = round(self.left * pixel_ratio)
+        bottom = round(self.bottom * pixel_ratio)
+        return left, bottom, max(1, round(self.width * scale)), max(1, round(self.height * scale))
+
+    def to_logical(self, x, y):
+        return (x - self.left) / self.scale, (y - self.bottom) / self.scale
+
+
+def button_column(keys, cx, first_y, w, h, spacing):
+    return {key: Rect(cx, first_y - i * spacing, w, h) for i, key in enumerate(keys)}
+
+
+class ListView:
+    # A vertical list of equal rows seen through a viewport. Only the rows
+    # inside the viewport get rects, rebuilt when the viewport or scroll
+    # offset changes; hit-testing maps y straight to a row index.
+    def __init__(self, count, row_height, box_width, box_height):
+        self.count = count
+        self.row_height = row_height
+        self.box_width = box_width
+        self.box_height = box_height
+        self.cx = 0
+        self.top = 0
+        self.bottom = 0
+        self.scroll = 0
+        self.first = 0
+        self.rects = []
+
+    @property
+    def max_visible(self):
+        # Rows that can be at least partly visible at once.
+        return math.ceil((self.top - self.bottom) / self.row_height) + 1
+
+    @property
+    def max_scroll(self):
+        return max(0, self.count * self.row_height - (self.top - self.bottom))
+
+    def place(self, cx, top, bottom):
+        self.cx = cx
+        self.top = top
+        self.bottom = bottom
+        self.scroll = min(self.scroll, self.max_scroll)
+        self._rebuild()
+
+    def set_count(self, count):
+        self.count = count
+        self.place(self.cx, self.top, self.bottom)
+
+    def scroll_by(self, dy):
+        scroll = min(max(self.scroll + dy, 0), self.max_scroll)
+        if scroll == self.scroll:
+            return False
+        self.scroll = scroll
+        self._rebuild()
+        return True
+
+    def _row_center(self, row):
+        return self.top + self.scroll - (row + 0.5) * self.row_height
+
+    def _rebuild(self):
+        first = int(self.scroll // self.row_height)
+        last = min(self.count, math.ceil((self.scroll + self.top - self.bottom) / self.row_height))
+        self.first = first
+        self.rects = [Rect(self.cx, self._row_center(row), self.box_width, self.box_height) for row in range(first, last)]
+
+    def visible(self):
+        return enumerate(self.rects, self.first)
+
+    def row_at(self, x, y):
+        if not self.bottom <= y <= self.top:
+            return None
+        row = int((self.top + self.scroll - y) // self.row_height)
+        i = row - self.first
+        if 0 <= i < len(self.rects) and self.rects[i].contains(x, y):
+            return row
+        return None
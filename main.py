@@ -1,26 +1,52 @@
-import json
-import hashlib
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
 import os
-import random
 from enum import Enum, auto
 
 import arcade
+from pyglet.graphics import Batch
+
+from simulation import (
+    FLIP,
+    FLIP_BUFFER,
+    GRAVITY_BOTTOM_Y,
+    GRAVITY_TOP_Y,
+    PLAYER_SIZE,
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+    Simulation,
+)
+from profiler import (
+    DRAW_GAME,
+    DRAW_GAME_OVER_OVERLAY,
+    DRAW_MENU,
+    DRAW_PAUSE_OVERLAY,
+    DRAW_SKINS_MENU,
+    PHASE_NAMES,
+    SAVE,
+    FrameProfiler,
+    StartupProfile,
+)
+from assets import AssetManager
+from difficulty import MODE_NAMES
+from history import HistoryWriter
+from input_queue import InputQueue
+from sounds import SoundManager
+from layout import Letterbox, ListView, button_column
+from rect_batch import RectBatch
+from render_cache import ScaledScreen, ScreenCache
+from storage import SaveWriter, read_save
 
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
 SCREEN_TITLE = "StickyCubes"
 
-PLAYER_SIZE = 26
+FULL_RATE = 60
+IDLE_RATE = 5
+IDLE_DELAY = 2.0
 
-OBSTACLE_WIDTH = 30
-OBSTACLE_MIN_HEIGHT = 50
-OBSTACLE_MAX_HEIGHT = 110
-OBSTACLE_SPEED = 120
-OBSTACLE_SPAWN_INTERVAL = 2.4
-
-GRAVITY_TOP_Y = SCREEN_HEIGHT - PLAYER_SIZE / 2 - 10
-GRAVITY_BOTTOM_Y = PLAYER_SIZE / 2 + 10
-PHYSICS_GRAVITY = 1.4
+OBSTACLE_COLORS = (arcade.color.CADMIUM_RED, arcade.color.CADMIUM_ORANGE)
 
 
 class GameState(Enum):
@@ -31,31 +57,128 @@ class GameState(Enum):
     SKINS = auto()
 
 
-class GravityDirection(Enum):
-    DOWN = auto()
-    UP = auto()
+class ScreenText:
+    # Labels are declared up front but only created, which rasterises their
+    # glyphs, on first use or when build() is called ahead of time.
+    def __init__(self):
+        self.batch = None
+        self.specs = {}
+        self.labels = {}
+        self.templates = {}
+        self.values = {}
+
+    def add(self, key, text, x, y, color, font_size, anchor_x="left"):
+        self.specs[key] = [x, y, color, font_size, anchor_x]
+        self.templates[key] = text
+        self.values[key] = None
+
+    def build(self):
+        if self.batch is not None:
+            return
+        self.batch = Batch()
+        for key, (x, y, color, font_size, anchor_x) in self.specs.items():
+            value = self.values[key]
+            text = self.templates[key] if value is None else self.templates[key].format(value)
+            self.labels[key] = arcade.Text(text, x, y, color, font_size=font_size, anchor_x=anchor_x, batch=self.batch)
+
+    def update(self, key, value):
+        if self.values[key] == value:
+            return
+        self.values[key] = value
+        if self.batch is not None:
+            self.labels[key].text = self.templates[key].format(value)
+
+    def move(self, key, x, y):
+        spec = self.specs[key]
+        if (spec[0], spec[1]) == (x, y):
+            return
+        spec[0] = x
+        spec[1] = y
+        if self.batch is not None:
+            self.labels[key].position = (x, y)
+
+    def draw(self):
+        self.build()
+        self.batch.draw()
 
 
 class GravityCubeGame(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, resizable=False)
+    def __init__(
+        self,
+        profiler=None,
+        trace_path=None,
+        full_rate=FULL_RATE,
+        idle_rate=IDLE_RATE,
+        record_path=None,
+        replay=None,
+        startup=None,
+        mode="classic",
+        flip_buffer=FLIP_BUFFER,
+        render_scale=None,
+        fullscreen=False,
+        data_dir=None,
+    ):
+        if startup:
+            startup.mark("imports")
+        super().__init__(
+            SCREEN_WIDTH,
+            SCREEN_HEIGHT,
+            SCREEN_TITLE,
+            resizable=True,
+            fullscreen=fullscreen,
+            update_rate=1 / full_rate,
+            draw_rate=1 / full_rate,
+        )
         arcade.set_background_color(arcade.color.DARK_MIDNIGHT_BLUE)
+        self.startup = startup
+        # Where save.dat and the run history live; the game's own folder
+        # unless given, e.g. a scratch folder for benchmarks.
+        self.data_dir = data_dir or os.path.dirname(__file__)
+        if startup:
+            startup.mark("window")
+        self.assets = AssetManager()
+        self.sounds = SoundManager(self.assets)
+        self.sounds.add("click", ":resources:sounds/upgrade4.wav", voices=4)
+        self.sounds.add("flip", ":resources:sounds/jump1.wav", voices=3, volume=0.4)
+        self.sounds.add("crash", ":resources:sounds/hurt3.wav", voices=1, volume=0.7)
+
+        self.full_rate = full_rate
+        self.idle_rate = idle_rate
+        self.idle = False
+        self.last_input = time.perf_counter()
+        self.pacing = None
 
         self.state = GameState.MENU
-        self.gravity = GravityDirection.DOWN
-
-        self.player_sprite = arcade.SpriteSolidColor(PLAYER_SIZE, PLAYER_SIZE, arcade.color.BRIGHT_GREEN)
-        self.player_x = SCREEN_WIDTH // 3
-        self.player_y = GRAVITY_BOTTOM_Y
-        self.obstacles = []
-        self.wall_list = arcade.SpriteList()
-        self.physics_engine = None
+        self.simulation = Simulation(mode=mode, flip_buffer=flip_buffer)
+        self.inputs = InputQueue()
+        self.record_path = record_path
+        self.record_number = None
+        if record_path:
+            from replay import next_free_number
+
+            # Numbered on from earlier sessions' replays, looked up once here.
+            self.record_number = next_free_number(record_path)
+        self.replay = replay
+        if replay is not None:
+            from replay import ReplayPlayer
+
+            self.simulation = Simulation(tick_rate=replay.tick_rate, mode=replay.mode)
+            self.simulation.playback = ReplayPlayer(replay)
+
+        self.profiler = profiler
+        self.simulation.profiler = profiler
+        self.trace_path = trace_path
+        self.show_profiler = False
+        self.profiler_refreshed = 0.0
+
+        self.player_sprite = arcade.SpriteSolidColor(PLAYER_SIZE, PLAYER_SIZE, color=arcade.color.BRIGHT_GREEN)
+
+        self.playfield_list = arcade.SpriteList()
+        self.player_list = arcade.SpriteList()
+        self.player_list.append(self.player_sprite)
+        self.obstacle_batch = RectBatch(self.ctx)
+        self._setup_playfield_sprites()
 
-        self.time_since_last_spawn = 0.0
-        self.score = 0
-
-        self.switch_cooldown = 0.35
-        self.time_since_switch = 0.0
         self.coins = 0
         self.best_score = 0
         self.skins = [
@@ -65,65 +188,148 @@ class GravityCubeGame(arcade.Window):
             {"name": "Золотой", "color": arcade.color.GOLD, "price": 350, "owned": False, "rarity": 2},
         ]
         self.current_skin_index = 0
+        self.skin_order = sorted(range(len(self.skins)), key=lambda i: self.skins[i]["rarity"])
+        # Layout and hit-testing stay in SCREEN_WIDTH x SCREEN_HEIGHT logical
+        # units whatever the window size or render scale.
+        self.letterbox = Letterbox(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.scaled_screen = ScaledScreen(self.ctx, (SCREEN_WIDTH, SCREEN_HEIGHT), render_scale)
+        self.screen_cache = ScreenCache(self.ctx, self.scaled_screen.size)
+        self._fit_window(*self.get_size())
 
-        self.menu_buttons = {
-            "start": {"x": 0, "y": 0, "w": 220, "h": 60},
-            "skins": {"x": 0, "y": 0, "w": 220, "h": 60},
-            "quit": {"x": 0, "y": 0, "w": 220, "h": 60},
-        }
+        self.menu_buttons = {}
+        self.skins_list = ListView(len(self.skin_order), 70, 380, 55)
 
         self._setup_menu_layout()
+        if startup:
+            startup.mark("sprites")
+        self._setup_text()
+        self._setup_profiler_text()
+        # Only the menu is needed for the first frame; the other screens'
+        # labels are built one per update once it is on screen.
+        self.first_frame_drawn = False
+        self.unbuilt_text = [self.game_text, self.skins_text, self.skin_rows_text, self.game_over_text, self.pause_text]
+        if startup:
+            startup.mark("text")
         self._load_progress()
-        self.click_sound = arcade.load_sound(":resources:sounds/upgrade4.wav")
+        self.save_writer = SaveWriter(self._save_path())
+        self.history = HistoryWriter(self._history_path())
+        if startup:
+            startup.mark("save")
 
     def setup_game(self):
         self.state = GameState.GAME
-        self.gravity = GravityDirection.DOWN
-        self.time_since_last_spawn = 0.0
-        self.score = 0
-        self.time_since_switch = 0.0
-        self.player_x = SCREEN_WIDTH // 3
-        self.player_y = GRAVITY_BOTTOM_Y
-        self.player_sprite.center_x = self.player_x
-        self.player_sprite.center_y = self.player_y
-        self.obstacles = []
-
-        if len(self.wall_list) == 0:
-            floor_height = 4
-            floor = arcade.SpriteSolidColor(SCREEN_WIDTH, floor_height, (0, 0, 0, 0))
-            bottom_line = GRAVITY_BOTTOM_Y - PLAYER_SIZE / 2
-            floor.center_x = SCREEN_WIDTH / 2
-            floor.center_y = bottom_line - floor_height / 2
-            self.wall_list.append(floor)
-
-            ceil_height = 4
-            ceil = arcade.SpriteSolidColor(SCREEN_WIDTH, ceil_height, (0, 0, 0, 0))
-            top_line = GRAVITY_TOP_Y + PLAYER_SIZE / 2
-            ceil.center_x = SCREEN_WIDTH / 2
-            ceil.center_y = top_line + ceil_height / 2
-            self.wall_list.append(ceil)
-
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player_sprite,
-            gravity_constant=PHYSICS_GRAVITY,
-            walls=self.wall_list,
+        if self.replay is not None:
+            self.simulation.reset(seed=self.replay.seed)
+            self.simulation.playback.rewind()
+        else:
+            self.simulation.reset()
+        self.inputs.clear()
+        self.screen_cache.invalidate()
+
+    def _setup_playfield_sprites(self):
+        bottom_line = GRAVITY_BOTTOM_Y - PLAYER_SIZE / 2
+        top_line = GRAVITY_TOP_Y + PLAYER_SIZE / 2
+        for line_y in (bottom_line, top_line):
+            line = arcade.SpriteSolidColor(SCREEN_WIDTH, 2, SCREEN_WIDTH / 2, line_y, color=arcade.color.GRAY)
+            self.playfield_list.append(line)
+
+    def _sync_obstacles(self):
+        sim = self.simulation
+        obstacles = sim.obstacles
+        xs, ys, ws, hs, tops, speeds = obstacles.live()
+        # Drawn at the same moment as the player, (1 - alpha) ticks behind
+        # the simulation, so each obstacle sits a little to the right of x.
+        # x is sorted, so everything not yet on screen is one tail to skip.
+        shift = sim.tick_dt * (1 - sim.alpha)
+        edge = SCREEN_WIDTH + obstacles.max_w / 2
+        n = int(xs.searchsorted(edge, "right"))
+        rects, colors = self.obstacle_batch.reserve(n)
+        rects[:, 0] = xs[:n]
+        rects[:, 0] += speeds[:n] * shift
+        rects[:, 1] = ys[:n]
+        rects[:, 2] = ws[:n]
+        rects[:, 3] = hs[:n]
+        colors[:] = OBSTACLE_COLORS[0]
+        colors[tops[:n]] = OBSTACLE_COLORS[1]
+
+    def _setup_text(self):
+        self.menu_text = ScreenText()
+        self.menu_text.add("title", "StickyCubes", SCREEN_WIDTH / 2, SCREEN_HEIGHT - 120, arcade.color.WHITE, 40, anchor_x="center")
+        labels = {"start": "Начать игру", "skins": "Скины", "quit": "Выход"}
+        for key, rect in self.menu_buttons.items():
+            self.menu_text.add(key, labels[key], rect.cx, rect.cy - 10, arcade.color.WHITE, 18, anchor_x="center")
+        self.menu_text.add(
+            "controls",
+            "Управление: ЛКМ - сменить гравитацию, ESC - меню",
+            SCREEN_WIDTH / 2,
+            40,
+            arcade.color.LIGHT_GRAY,
+            14,
+            anchor_x="center",
+        )
+        self.menu_text.add("coins", "Монеты: {}", SCREEN_WIDTH / 2, 80, arcade.color.GOLD, 16, anchor_x="center")
+
+        self.game_text = ScreenText()
+        self.game_text.add("score", "Счёт: {}", 10, SCREEN_HEIGHT - 30, arcade.color.WHITE, 18)
+        self.game_text.add("best", "Рекорд: {}", 10, SCREEN_HEIGHT - 55, arcade.color.LIGHT_GRAY, 16)
+
+        self.game_over_text = ScreenText()
+        cx = SCREEN_WIDTH / 2
+        cy = SCREEN_HEIGHT / 2
+        self.game_over_text.add("title", "Вы разбились!", cx, cy + 60, arcade.color.WHITE, 32, anchor_x="center")
+        self.game_over_text.add("score", "Итоговый счёт: {}", cx, cy + 20, arcade.color.LIGHT_GRAY, 20, anchor_x="center")
+        self.game_over_text.add("coins", "Монеты всего: {}", cx, cy - 10, arcade.color.GOLD, 18, anchor_x="center")
+        self.game_over_text.add("best", "Рекорд: {}", cx, cy - 40, arcade.color.GOLD, 18, anchor_x="center")
+        self.game_over_text.add(
+            "hint", "ЛКМ - начать заново   |   ESC - в меню", cx, cy - 70, arcade.color.WHITE, 18, anchor_x="center"
         )
 
+        self.pause_text = ScreenText()
+        self.pause_text.add("title", "Пауза", cx, cy + 40, arcade.color.WHITE, 32, anchor_x="center")
+        self.pause_text.add("hint", "ESC - продолжить   |   M - меню", cx, cy - 10, arcade.color.LIGHT_GRAY, 18, anchor_x="center")
+        self.pause_text.add(
+            "warning",
+            "Внимание: выход в меню сбросит текущую попытку (очки не добавятся к монетам).",
+            cx,
+            cy - 50,
+            arcade.color.ORANGE,
+            14,
+            anchor_x="center",
+        )
+
+        self.skins_text = ScreenText()
+        self.skins_text.add("title", "Скины куба", cx, SCREEN_HEIGHT - 80, arcade.color.WHITE, 34, anchor_x="center")
+        self.skins_text.add("coins", "Монеты: {}", cx, SCREEN_HEIGHT - 130, arcade.color.GOLD, 18, anchor_x="center")
+        self.skins_text.add("back", "ESC - назад в меню", cx, 40, arcade.color.LIGHT_GRAY, 16, anchor_x="center")
+
+        # One pair of labels per row slot the list can show at once; rows
+        # scrolled into view reuse them.
+        self.skin_rows_text = ScreenText()
+        for slot in range(self.skins_list.max_visible):
+            self.skin_rows_text.add(f"name_{slot}", "{}", 0, 0, arcade.color.WHITE, 16)
+            self.skin_rows_text.add(f"status_{slot}", "{}", 0, 0, arcade.color.LIGHT_GRAY, 14)
+
+    def _setup_profiler_text(self):
+        self.profiler_text = ScreenText()
+        x = SCREEN_WIDTH - 240
+        y = SCREEN_HEIGHT - 30
+        for key in ("fps", "frame", "obstacles", "input") + PHASE_NAMES:
+            self.profiler_text.add(key, "{}", x, y, arcade.color.WHITE, 10)
+            # Shown until the first stats, or the first measured flip for "input".
+            self.profiler_text.update(key, f"{key}: –")
+            y -= 16
+
     def _setup_menu_layout(self):
         center_x = SCREEN_WIDTH // 2
         center_y = SCREEN_HEIGHT // 2
-
-        self.menu_buttons["start"]["x"] = center_x
-        self.menu_buttons["start"]["y"] = center_y + 70
-
-        self.menu_buttons["skins"]["x"] = center_x
-        self.menu_buttons["skins"]["y"] = center_y
-
-        self.menu_buttons["quit"]["x"] = center_x
-        self.menu_buttons["quit"]["y"] = center_y - 70
+        self.menu_buttons = button_column(("start", "skins", "quit"), center_x, center_y + 70, 220, 60, 70)
+        self.skins_list.place(center_x, SCREEN_HEIGHT - 155, 70)
 
     def _save_path(self):
-        return os.path.join(os.path.dirname(__file__), "save.dat")
+        return os.path.join(self.data_dir, "save.dat")
+
+    def _history_path(self):
+        return os.path.join(os.path.dirname(self._save_path()), "runs.dat")
 
     def _save_progress(self):
         data = {
@@ -132,34 +338,11 @@ class GravityCubeGame(arcade.Window):
             "current": self.current_skin_index,
             "best": self.best_score,
         }
-        raw = json.dumps(data, separators=(",", ":"), sort_keys=True)
-        secret = "sticky_cubes_secret_v1"
-        checksum = hashlib.sha256((secret + raw).encode("utf-8")).hexdigest()
-        try:
-            with open(self._save_path(), "w", encoding="utf-8") as f:
-                f.write(checksum + "\n" + raw)
-        except OSError:
-            pass
+        self.save_writer.submit(data)
 
     def _load_progress(self):
-        path = self._save_path()
-        if not os.path.exists(path):
-            return
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                first = f.readline().strip()
-                raw = f.read().strip()
-        except OSError:
-            return
-        if not first or not raw:
-            return
-        secret = "sticky_cubes_secret_v1"
-        expected = hashlib.sha256((secret + raw).encode("utf-8")).hexdigest()
-        if expected != first:
-            return
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
+        data = read_save(self._save_path())
+        if data is None:
             return
         coins = data.get("coins")
         owned = data.get("owned")
@@ -176,365 +359,276 @@ class GravityCubeGame(arcade.Window):
         if isinstance(best, int) and best >= 0:
             self.best_score = best
 
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        self._state = value
+        self.idle = False
+        self.last_input = time.perf_counter()
+        self._apply_pacing()
+
+    def _apply_pacing(self):
+        if not self.idle:
+            pacing = (1 / self.full_rate, 1 / self.full_rate)
+        elif self.idle_rate > 0:
+            pacing = (1 / self.idle_rate, 1 / self.idle_rate)
+        else:
+            # Redraw only on input: keep a slow update tick, never draw.
+            pacing = (1.0, float("inf"))
+        if pacing == self.pacing:
+            return
+        self.pacing = pacing
+        self.set_update_rate(pacing[0])
+        self.set_draw_rate(pacing[1])
+
+    def _wake(self):
+        self.last_input = time.perf_counter()
+        if self.idle:
+            self.idle = False
+            self._apply_pacing()
+
     def on_update(self, delta_time):
+        if self.unbuilt_text and self.first_frame_drawn:
+            self.unbuilt_text.pop(0).build()
+        self.sounds.update()
+        if self.startup and not self.assets.pending:
+            print(f"background assets ready after {self.startup.elapsed() * 1000:.1f} ms")
+            self.startup = None
+
         if self.state != GameState.GAME:
+            if not self.idle and time.perf_counter() - self.last_input >= IDLE_DELAY:
+                self.idle = True
+                self._apply_pacing()
             return
 
-        self.time_since_switch += delta_time
-
-        if self.physics_engine is not None:
-            self.physics_engine.update()
-            self.player_x = self.player_sprite.center_x
-            self.player_y = self.player_sprite.center_y
-
-            snap_eps = 2.0
-            if self.gravity == GravityDirection.DOWN:
-                target_y = GRAVITY_BOTTOM_Y
-            else:
-                target_y = GRAVITY_TOP_Y
-            if abs(self.player_y - target_y) <= snap_eps:
-                self.player_y = target_y
-                self.player_sprite.center_y = target_y
-                self.player_sprite.change_y = 0
-
-        self.time_since_last_spawn += delta_time
-        if self.time_since_last_spawn >= OBSTACLE_SPAWN_INTERVAL:
-            self.time_since_last_spawn = 0.0
-            self.spawn_obstacles_pair()
-
-        new_obstacles = []
-        for ob in self.obstacles:
-            ob_x = ob["x"] - OBSTACLE_SPEED * delta_time
-            ob["x"] = ob_x
-            if ob_x + ob["w"] / 2 >= 0:
-                new_obstacles.append(ob)
-            else:
-                self.score += 1
-        self.obstacles = new_obstacles
-
-        hitbox_scale = 0.7
-        half_w = PLAYER_SIZE * hitbox_scale / 2
-        half_h = PLAYER_SIZE * hitbox_scale / 2
-        player_left = self.player_x - half_w
-        player_right = self.player_x + half_w
-        player_bottom = self.player_y - half_h
-        player_top = self.player_y + half_h
-
-        for ob in self.obstacles:
-            ob_half_w = ob["w"] * hitbox_scale / 2
-            ob_half_h = ob["h"] * hitbox_scale / 2
-            ob_left = ob["x"] - ob_half_w
-            ob_right = ob["x"] + ob_half_w
-            ob_bottom = ob["y"] - ob_half_h
-            ob_top = ob["y"] + ob_half_h
-            if not (player_right < ob_left or player_left > ob_right or player_top < ob_bottom or player_bottom > ob_top):
-                if self.score > self.best_score:
-                    self.best_score = self.score
-                self.coins += self.score
-                self._save_progress()
+        sim = self.simulation
+        flips, buffered, dropped = len(sim.flip_ticks), sim.buffered_flips, sim.dropped_flips
+        # Clicks stay queued through frames that run no tick; advance()
+        # only hands inputs to a tick.
+        sim.advance(delta_time, self.inputs.drain() if sim.will_step(delta_time) else [])
+        flipped = len(sim.flip_ticks) != flips
+        self.inputs.resolve(flipped, sim.buffered_flips - buffered, sim.dropped_flips - dropped)
+        if flipped:
+            self.sounds.play("flip")
+
+        if sim.crashed:
+            self.sounds.play("crash")
+            if self.replay is not None:
                 self.state = GameState.GAME_OVER
-                break
-
-    def spawn_obstacles_pair(self):
-        height = random.randint(OBSTACLE_MIN_HEIGHT, OBSTACLE_MAX_HEIGHT)
-        side_top = random.choice([False, True])
-
-        if side_top:
-            obstacle = {
-                "x": SCREEN_WIDTH + OBSTACLE_WIDTH / 2,
-                "y": SCREEN_HEIGHT - height / 2,
-                "w": OBSTACLE_WIDTH,
-                "h": height,
-                "top": True,
-            }
-        else:
-            obstacle = {
-                "x": SCREEN_WIDTH + OBSTACLE_WIDTH / 2,
-                "y": height / 2,
-                "w": OBSTACLE_WIDTH,
-                "h": height,
-                "top": False,
-            }
-
-        self.obstacles.append(obstacle)
+                return
+            if self.record_path:
+                from replay import Replay, numbered_path
+
+                path = numbered_path(self.record_path, self.record_number)
+                self.record_number += 1
+                self.save_writer.submit_file(path, Replay.from_simulation(sim).encode())
+            score = sim.score
+            if score > self.best_score:
+                self.best_score = score
+            self.coins += score
+            if self.profiler:
+                self.profiler.begin()
+            self.history.submit(score, sim.tick * sim.tick_dt, self.current_skin_index, sim.mode, sim.seed)
+            self._save_progress()
+            if self.profiler:
+                self.profiler.mark(SAVE)
+            self.state = GameState.GAME_OVER
+
+    def on_resize(self, width, height):
+        # The cached screen was just dropped, so an idle window has to draw.
+        self._wake()
+        self._fit_window(width, height)
+
+    def _fit_window(self, width, height):
+        self.letterbox.fit(width, height)
+        self.scaled_screen.resize(self.letterbox.viewport(self.get_pixel_ratio()))
+        self.screen_cache.resize(self.scaled_screen.size)
 
     def on_draw(self):
-        self.clear()
+        prof = self.profiler
+        if prof:
+            prof.begin()
+
+        self.clear(color=arcade.color.BLACK)
+        self.scaled_screen.draw(self.background_color, self.draw_scene)
+        if prof:
+            prof.end_frame()
+        self.inputs.presented()
+
+        if not self.first_frame_drawn:
+            self.first_frame_drawn = True
+            if self.startup:
+                self.ctx.finish()
+                self.startup.mark("first frame")
+                print(self.startup.report())
+
+    def _static_screen_key(self):
+        # Everything a non-gameplay screen shows; the cached image is reused
+        # until one of these changes.
+        if self.state == GameState.GAME:
+            return None
+        owned = tuple(s["owned"] for s in self.skins)
+        sim = self.simulation
+        return (
+            self.state,
+            self.coins,
+            self.best_score,
+            self.current_skin_index,
+            owned,
+            self.skins_list.scroll,
+            sim.tick,
+            sim.score,
+        )
 
+    def draw_scene(self):
+        key = self._static_screen_key()
+        if key is None:
+            self.draw_screen()
+        else:
+            self.screen_cache.draw(key, self.background_color, self.draw_screen)
+
+        if self.show_profiler:
+            self.draw_profiler_overlay()
+
+    def draw_screen(self):
+        prof = self.profiler
         if self.state == GameState.MENU:
             self.draw_menu()
+            if prof:
+                prof.mark(DRAW_MENU)
         elif self.state == GameState.GAME:
             self.draw_game()
+            if prof:
+                prof.mark(DRAW_GAME)
         elif self.state == GameState.PAUSE:
             self.draw_game()
+            if prof:
+                prof.mark(DRAW_GAME)
             self.draw_pause_overlay()
+            if prof:
+                prof.mark(DRAW_PAUSE_OVERLAY)
         elif self.state == GameState.SKINS:
             self.draw_skins_menu()
+            if prof:
+                prof.mark(DRAW_SKINS_MENU)
         elif self.state == GameState.GAME_OVER:
             self.draw_game()
+            if prof:
+                prof.mark(DRAW_GAME)
             self.draw_game_over_overlay()
+            if prof:
+                prof.mark(DRAW_GAME_OVER_OVERLAY)
 
     def draw_menu(self):
-        arcade.draw_text(
-            "StickyCubes",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT - 120,
-            arcade.color.WHITE,
-            font_size=40,
-            anchor_x="center",
-        )
-
-        for key, rect in self.menu_buttons.items():
-            x = rect["x"]
-            y = rect["y"]
-            w = rect["w"]
-            h = rect["h"]
-            left = x - w / 2
-            right = x + w / 2
-            bottom = y - h / 2
-            top = y + h / 2
+        for rect in self.menu_buttons.values():
             color = arcade.color.DARK_SLATE_GRAY
-            arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, color)
-            arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.WHITE, 2)
-
-            if key == "start":
-                label = "Начать игру"
-            elif key == "skins":
-                label = "Скины"
-            else:
-                label = "Выход"
-            arcade.draw_text(
-                label,
-                x,
-                y - 10,
-                arcade.color.WHITE,
-                font_size=18,
-                anchor_x="center",
-            )
+            arcade.draw_lrbt_rectangle_filled(rect.left, rect.right, rect.bottom, rect.top, color)
+            arcade.draw_lrbt_rectangle_outline(rect.left, rect.right, rect.bottom, rect.top, arcade.color.WHITE, 2)
 
-        arcade.draw_text(
-            "Управление: ЛКМ - сменить гравитацию, ESC - меню",
-            SCREEN_WIDTH / 2,
-            40,
-            arcade.color.LIGHT_GRAY,
-            font_size=14,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            f"Монеты: {self.coins}",
-            SCREEN_WIDTH / 2,
-            80,
-            arcade.color.GOLD,
-            font_size=16,
-            anchor_x="center",
-        )
+        self.menu_text.update("coins", self.coins)
+        self.menu_text.draw()
 
     def draw_game(self):
-        arcade.draw_line(0, GRAVITY_BOTTOM_Y - PLAYER_SIZE / 2, SCREEN_WIDTH, GRAVITY_BOTTOM_Y - PLAYER_SIZE / 2, arcade.color.GRAY, 2)
-        arcade.draw_line(0, GRAVITY_TOP_Y + PLAYER_SIZE / 2, SCREEN_WIDTH, GRAVITY_TOP_Y + PLAYER_SIZE / 2, arcade.color.GRAY, 2)
-
-        for ob in self.obstacles:
-            x = ob["x"]
-            y = ob["y"]
-            w = ob["w"]
-            h = ob["h"]
-            left = x - w / 2
-            right = x + w / 2
-            bottom = y - h / 2
-            top = y + h / 2
-            arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, arcade.color.CADMIUM_RED if not ob.get("top") else arcade.color.CADMIUM_ORANGE)
-
-        player_left = self.player_x - PLAYER_SIZE / 2
-        player_right = self.player_x + PLAYER_SIZE / 2
-        player_bottom = self.player_y - PLAYER_SIZE / 2
-        player_top = self.player_y + PLAYER_SIZE / 2
-        color = self.skins[self.current_skin_index]["color"]
-        arcade.draw_lrbt_rectangle_filled(player_left, player_right, player_bottom, player_top, color)
-
-        arcade.draw_text(
-            f"Счёт: {self.score}",
-            10,
-            SCREEN_HEIGHT - 30,
-            arcade.color.WHITE,
-            font_size=18,
-        )
-        arcade.draw_text(
-            f"Рекорд: {self.best_score}",
-            10,
-            SCREEN_HEIGHT - 55,
-            arcade.color.LIGHT_GRAY,
-            font_size=16,
-        )
+        self._sync_obstacles()
+        sim = self.simulation
+        player_y = sim.prev_player_y + (sim.player_y - sim.prev_player_y) * sim.alpha
+        self.player_sprite.position = (sim.player_x, player_y)
+        self.player_sprite.color = self.skins[self.current_skin_index]["color"]
+
+        self.playfield_list.draw()
+        self.obstacle_batch.draw()
+        self.player_list.draw()
+
+        self.game_text.update("score", self.simulation.score)
+        self.game_text.update("best", self.best_score)
+        self.game_text.draw()
 
     def draw_game_over_overlay(self):
         arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, (0, 0, 0, 180))
 
-        arcade.draw_text(
-            "Вы разбились!",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 + 60,
-            arcade.color.WHITE,
-            font_size=32,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            f"Итоговый счёт: {self.score}",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 + 20,
-            arcade.color.LIGHT_GRAY,
-            font_size=20,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            f"Монеты всего: {self.coins}",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 - 10,
-            arcade.color.GOLD,
-            font_size=18,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            f"Рекорд: {self.best_score}",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 - 40,
-            arcade.color.GOLD,
-            font_size=18,
-            anchor_x="center",
-        )
-
-        arcade.draw_text(
-            "ЛКМ - начать заново   |   ESC - в меню",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 - 70,
-            arcade.color.WHITE,
-            font_size=18,
-            anchor_x="center",
-        )
+        self.game_over_text.update("score", self.simulation.score)
+        self.game_over_text.update("coins", self.coins)
+        self.game_over_text.update("best", self.best_score)
+        self.game_over_text.draw()
 
     def draw_pause_overlay(self):
         arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, (0, 0, 0, 140))
-        arcade.draw_text(
-            "Пауза",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 + 40,
-            arcade.color.WHITE,
-            font_size=32,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            "ESC - продолжить   |   M - меню",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 - 10,
-            arcade.color.LIGHT_GRAY,
-            font_size=18,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            "Внимание: выход в меню сбросит текущую попытку (очки не добавятся к монетам).",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT / 2 - 50,
-            arcade.color.ORANGE,
-            font_size=14,
-            anchor_x="center",
-        )
+        self.pause_text.draw()
 
     def draw_skins_menu(self):
-        arcade.draw_text(
-            "Скины куба",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT - 80,
-            arcade.color.WHITE,
-            font_size=34,
-            anchor_x="center",
-        )
-        arcade.draw_text(
-            f"Монеты: {self.coins}",
-            SCREEN_WIDTH / 2,
-            SCREEN_HEIGHT - 130,
-            arcade.color.GOLD,
-            font_size=18,
-            anchor_x="center",
-        )
-        start_y = SCREEN_HEIGHT - 190
-        row_h = 70
-        box_w = 380
-        box_h = 55
-        order = sorted(range(len(self.skins)), key=lambda i: self.skins[i]["rarity"])
-        for row, idx in enumerate(order):
+        rows = self.skins_list
+        # Scissor boxes are in pixels of whatever target is bound.
+        left, bottom, width, height = self.ctx.viewport
+        ratio = height / SCREEN_HEIGHT
+        self.ctx.scissor = (left, bottom + int(rows.bottom * ratio), width, int((rows.top - rows.bottom) * ratio))
+        slot = 0
+        for row, rect in rows.visible():
+            idx = self.skin_order[row]
             skin = self.skins[idx]
-            y = start_y - row * row_h
-            x = SCREEN_WIDTH / 2
-            left = x - box_w / 2
-            right = x + box_w / 2
-            bottom = y - box_h / 2
-            top = y + box_h / 2
             bg = arcade.color.DARK_SLATE_GRAY if idx != self.current_skin_index else arcade.color.DARK_GREEN
-            arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, bg)
-            arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.WHITE, 2)
-            cube_left = left + 20
-            cube_right = cube_left + 40
-            cube_bottom = y - 20
-            cube_top = y + 20
-            arcade.draw_lrbt_rectangle_filled(cube_left, cube_right, cube_bottom, cube_top, skin["color"])
-            name = skin["name"]
+            arcade.draw_lrbt_rectangle_filled(rect.left, rect.right, rect.bottom, rect.top, bg)
+            arcade.draw_lrbt_rectangle_outline(rect.left, rect.right, rect.bottom, rect.top, arcade.color.WHITE, 2)
+            cube_left = rect.left + 20
+            arcade.draw_lrbt_rectangle_filled(cube_left, cube_left + 40, rect.cy - 20, rect.cy + 20, skin["color"])
             status = "Куплен" if skin["owned"] else f"{skin['price']} монет"
-            arcade.draw_text(
-                name,
-                cube_right + 20,
-                y + 8,
-                arcade.color.WHITE,
-                font_size=16,
-                anchor_x="left",
-            )
-            arcade.draw_text(
-                status,
-                cube_right + 20,
-                y - 18,
-                arcade.color.LIGHT_GRAY,
-                font_size=14,
-                anchor_x="left",
-            )
-        arcade.draw_text(
-            "ESC - назад в меню",
-            SCREEN_WIDTH / 2,
-            40,
-            arcade.color.LIGHT_GRAY,
-            font_size=16,
-            anchor_x="center",
-        )
+            text_x = rect.left + 80
+            self.skin_rows_text.update(f"name_{slot}", skin["name"])
+            self.skin_rows_text.move(f"name_{slot}", text_x, rect.cy + 8)
+            self.skin_rows_text.update(f"status_{slot}", status)
+            self.skin_rows_text.move(f"status_{slot}", text_x, rect.cy - 18)
+            slot += 1
+        for unused in range(slot, rows.max_visible):
+            self.skin_rows_text.update(f"name_{unused}", "")
+            self.skin_rows_text.update(f"status_{unused}", "")
+        self.skin_rows_text.draw()
+        self.ctx.scissor = None
+
+        if rows.max_scroll:
+            view = rows.top - rows.bottom
+            thumb = max(20, view * view / (rows.count * rows.row_height))
+            thumb_top = rows.top - (view - thumb) * rows.scroll / rows.max_scroll
+            bar_x = rows.cx + rows.box_width / 2 + 12
+            arcade.draw_lrbt_rectangle_filled(bar_x - 3, bar_x + 3, thumb_top - thumb, thumb_top, arcade.color.LIGHT_GRAY)
+
+        self.skins_text.update("coins", self.coins)
+        self.skins_text.draw()
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        self._wake()
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        self._wake()
+
+    def on_mouse_release(self, x, y, button, modifiers):
+        self._wake()
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        self._wake()
+        if self.state == GameState.SKINS:
+            self.skins_list.scroll_by(-scroll_y * self.skins_list.row_height / 2)
 
     def on_mouse_press(self, x, y, button, modifiers):
+        self._wake()
         if button != arcade.MOUSE_BUTTON_LEFT:
             return
+        x, y = self.letterbox.to_logical(x, y)
 
         if self.state == GameState.MENU:
             self.handle_menu_click(x, y)
         elif self.state == GameState.SKINS:
             self.handle_skins_click(x, y)
-        elif self.state == GameState.GAME:
-            ground_snap = 4
-            on_bottom = abs(self.player_y - GRAVITY_BOTTOM_Y) <= ground_snap
-            on_top = abs(self.player_y - GRAVITY_TOP_Y) <= ground_snap
-            if self.time_since_switch >= self.switch_cooldown and (on_bottom or on_top):
-                self.gravity = GravityDirection.UP if self.gravity == GravityDirection.DOWN else GravityDirection.DOWN
-                if self.physics_engine is not None:
-                    if self.gravity == GravityDirection.DOWN:
-                        self.physics_engine.gravity_constant = abs(self.physics_engine.gravity_constant)
-                    else:
-                        self.physics_engine.gravity_constant = -abs(self.physics_engine.gravity_constant)
-                self.time_since_switch = 0.0
+        elif self.state == GameState.GAME and self.replay is None:
+            self.inputs.push(FLIP)
         elif self.state == GameState.GAME_OVER:
             self.setup_game()
 
     def handle_menu_click(self, x, y):
         for key, rect in self.menu_buttons.items():
-            left = rect["x"] - rect["w"] / 2
-            right = rect["x"] + rect["w"] / 2
-            bottom = rect["y"] - rect["h"] / 2
-            top = rect["y"] + rect["h"] / 2
-            if left <= x <= right and bottom <= y <= top:
-                if hasattr(self, "click_sound") and self.click_sound:
-                    arcade.play_sound(self.click_sound)
+            if rect.contains(x, y):
+                self.sounds.play("click")
                 if key == "start":
                     self.setup_game()
                 elif key == "skins":
@@ -543,34 +637,55 @@ class GravityCubeGame(arcade.Window):
                     arcade.close_window()
 
     def handle_skins_click(self, x, y):
-        start_y = SCREEN_HEIGHT - 190
-        row_h = 70
-        box_w = 380
-        box_h = 55
-        order = sorted(range(len(self.skins)), key=lambda i: self.skins[i]["rarity"])
-        for row, idx in enumerate(order):
-            skin = self.skins[idx]
-            row_y = start_y - row * row_h
-            cx = SCREEN_WIDTH / 2
-            left = cx - box_w / 2
-            right = cx + box_w / 2
-            bottom = row_y - box_h / 2
-            top = row_y + box_h / 2
-            if left <= x <= right and bottom <= y <= top:
-                if hasattr(self, "click_sound") and self.click_sound:
-                    arcade.play_sound(self.click_sound)
-                if skin["owned"]:
-                    self.current_skin_index = idx
-                else:
-                    if self.coins >= skin["price"]:
-                        self.coins -= skin["price"]
-                        skin["owned"] = True
-                        self.current_skin_index = idx
-                        self._save_progress()
-                self._save_progress()
-                break
+        row = self.skins_list.row_at(x, y)
+        if row is None:
+            return
+        idx = self.skin_order[row]
+        skin = self.skins[idx]
+        self.sounds.play("click")
+        if skin["owned"]:
+            self.current_skin_index = idx
+        else:
+            if self.coins >= skin["price"]:
+                self.coins -= skin["price"]
+                skin["owned"] = True
+                self.current_skin_index = idx
+        self._save_progress()
+
+    def draw_profiler_overlay(self):
+        now = time.perf_counter()
+        if now - self.profiler_refreshed >= 0.25:
+            self.profiler_refreshed = now
+            stats = self.profiler.stats()
+            if stats is not None:
+                self.profiler_text.update("fps", f"FPS: {stats['fps']:.0f}")
+                self.profiler_text.update("frame", f"p50 {stats['p50_ms']:.2f} ms   p99 {stats['p99_ms']:.2f} ms")
+                self.profiler_text.update("obstacles", f"obstacles: {len(self.simulation.obstacles)}")
+                for name in PHASE_NAMES:
+                    self.profiler_text.update(name, f"{name}: {stats['phases_ms'][name]:.3f} ms")
+            latency = self.inputs.stats()
+            if latency is not None:
+                self.profiler_text.update(
+                    "input",
+                    f"input p50 {latency['p50_ms']:.1f} p95 {latency['p95_ms']:.1f} ms"
+                    f"  buf {latency['buffered']} drop {latency['dropped']}",
+                )
+
+        left = SCREEN_WIDTH - 250
+        top = SCREEN_HEIGHT - 10
+        bottom = top - 20 - 16 * (len(PHASE_NAMES) + 4)
+        arcade.draw_lrbt_rectangle_filled(left, SCREEN_WIDTH - 10, bottom, top, (0, 0, 0, 170))
+        self.profiler_text.draw()
 
     def on_key_press(self, symbol, modifiers):
+        self._wake()
+        if symbol == arcade.key.F3:
+            if self.profiler is None:
+                self.profiler = FrameProfiler()
+                self.simulation.profiler = self.profiler
+            self.show_profiler = not self.show_profiler
+        if symbol == arcade.key.F11:
+            self.set_fullscreen(not self.fullscreen)
         if symbol == arcade.key.ESCAPE:
             if self.state == GameState.GAME:
                 self.state = GameState.PAUSE
@@ -583,9 +698,79 @@ class GravityCubeGame(arcade.Window):
         if symbol == arcade.key.M and self.state == GameState.PAUSE:
             self.state = GameState.MENU
 
+    def on_key_release(self, symbol, modifiers):
+        self._wake()
+
+    def close(self):
+        self.assets.close()
+        self.sounds.close()
+        self.save_writer.close()
+        self.history.close()
+        if self.trace_path and self.profiler:
+            self.profiler.write_trace(self.trace_path)
+        latency = self.inputs.stats()
+        if self.profiler and latency is not None:
+            print(
+                f"flip input latency over {latency['samples']} flips: mean {latency['mean_ms']:.1f} ms,"
+                f" p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, max {latency['max_ms']:.1f} ms;"
+                f" {latency['buffered']} buffered, {latency['dropped']} dropped"
+            )
+        super().close()
+
 
 def main():
-    window = GravityCubeGame()
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--trace", metavar="PATH", help="record frame phases and write a Chrome trace on exit")
+    parser.add_argument("--fps", type=float, default=FULL_RATE, help="update/draw rate during gameplay and input")
+    parser.add_argument(
+        "--idle-fps", type=float, default=IDLE_RATE, help="rate on idle menus and overlays (0 = redraw only on input)"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", help="write a replay of each finished run, numbered: PATH-0001, PATH-0002, ..."
+    )
+    parser.add_argument("--replay", metavar="PATH", help="watch a recorded run instead of playing")
+    parser.add_argument("--profile-startup", action="store_true", help="print time to first frame by phase")
+    parser.add_argument(
+        "--render-scale",
+        type=float,
+        metavar="SCALE",
+        help="draw at SCALE x 800x600 and stretch to the window (default: the window's own resolution)",
+    )
+    parser.add_argument("--fullscreen", action="store_true", help="start fullscreen (F11 toggles)")
+    parser.add_argument(
+        "--flip-buffer",
+        type=float,
+        default=FLIP_BUFFER * 1000,
+        metavar="MS",
+        help="how long an early flip waits for the cooldown or landing (0 = drop it)",
+    )
+    parser.add_argument(
+        "--mode", choices=MODE_NAMES, default="classic", help="difficulty: classic, endless (ramps with score) or stress"
+    )
+    args = parser.parse_args()
+
+    startup = StartupProfile(STARTED) if args.profile_startup else None
+    profiler = FrameProfiler(trace=True) if args.trace else None
+    replay = None
+    if args.replay:
+        from replay import Replay
+
+        replay = Replay.load(args.replay)
+    window = GravityCubeGame(
+        profiler=profiler,
+        trace_path=args.trace,
+        full_rate=args.fps,
+        idle_rate=args.idle_fps,
+        record_path=args.record,
+        replay=replay,
+        startup=startup,
+        mode=args.mode,
+        flip_buffer=args.flip_buffer / 1000,
+        render_scale=args.render_scale,
+        fullscreen=args.fullscreen,
+    )
+    if replay is not None:
+        window.setup_game()
     arcade.run()
 
 
@@ -0,0 +1,192 @@
+import numpy as np
+
+FIELDS = ("x", "y", "w", "h", "top", "speed")
+SCALAR_SWEEP_LIMIT = 8
+
+
+class ObstacleStore:
+    # Live obstacles occupy [head, head + count) of preallocated arrays,
+    # sorted by x. They leave on the left, so culling normally just moves
+    # head forward; the window is copied back to the front only when it runs
+    # into the end, and the arrays grow only if more than half of them is
+    # live at that point. Restarts keep the arrays.
+    def __init__(self, capacity=64):
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.w = np.zeros(capacity)
+        self.h = np.zeros(capacity)
+        self.top = np.zeros(capacity, dtype=bool)
+        self.speed = np.zeros(capacity)
+        self._scratch = np.zeros(capacity)
+        self.head = 0
+        self.count = 0
+        self.max_w = 0.0
+        self.max_speed = 0.0
+        self.mixed_speeds = False
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.max_w = 0.0
+        self.max_speed = 0.0
+        self.mixed_speeds = False
+
+    def live(self):
+        s = slice(self.head, self.head + self.count)
+        return self.x[s], self.y[s], self.w[s], self.h[s], self.top[s], self.speed[s]
+
+    def set_speed(self, speed):
+        self.speed[self.head : self.head + self.count] = speed
+        self.max_speed = speed
+        self.mixed_speeds = False
+
+    def truncate(self, count):
+        self.count = min(self.count, count)
+
+    def append(self, x, y, w, h, top, speed):
+        end = self.head + self.count
+        if end == len(self.x):
+            if self.head >= self.count:
+                self._move_to_front()
+            else:
+                self._grow()
+            end = self.count
+        if self.count and (speed != self.speed[end - 1] or x < self.x[end - 1]):
+            self.mixed_speeds = True
+        self.x[end] = x
+        self.y[end] = y
+        self.w[end] = w
+        self.h[end] = h
+        self.top[end] = top
+        self.speed[end] = speed
+        self.count += 1
+        self.max_w = max(self.max_w, w)
+        self.max_speed = max(self.max_speed, speed)
+
+    def _move_to_front(self):
+        # head >= count, so source and destination never overlap.
+        head, n = self.head, self.count
+        for name in FIELDS:
+            arr = getattr(self, name)
+            arr[:n] = arr[head : head + n]
+        self.head = 0
+
+    def _grow(self):
+        capacity = len(self.x) * 2
+        head, n = self.head, self.count
+        for name in FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:n] = old[head : head + n]
+            setattr(self, name, new)
+        self._scratch = np.zeros(capacity)
+        self.head = 0
+
+    def scroll(self, dt):
+        head, end = self.head, self.head + self.count
+        if not self.mixed_speeds:
+            if self.count:
+                self.x[head:end] -= self.speed[head] * dt
+            return
+        step = self._scratch[: self.count]
+        np.multiply(self.speed[head:end], dt, out=step)
+        self.x[head:end] -= step
+        self._restore_order()
+
+    def _restore_order(self):
+        # Broad phase relies on x being sorted. With a single speed spawn
+        # order already guarantees that; otherwise re-sort after overtakes.
+        head, end = self.head, self.head + self.count
+        x = self.x[head:end]
+        if self.count < 2 or not (x[1:] < x[:-1]).any():
+            return
+        order = np.argsort(x, kind="stable")
+        for name in FIELDS:
+            arr = getattr(self, name)
+            arr[head:end] = arr[head:end][order]
+
+    def cull(self):
+        # A culled obstacle has x < 0 and x is sorted, so only the leading
+        # run with x < 0 needs looking at; most ticks that run is empty.
+        # Survivors in it are shifted up against the rest in place.
+        head, end = self.head, self.head + self.count
+        x = self.x
+        if head == end or x[head] >= 0:
+            return 0
+        stop = head + 1
+        while stop < end and x[stop] < 0:
+            stop += 1
+        write = stop
+        for i in range(stop - 1, head - 1, -1):
+            if x[i] + self.w[i] / 2 >= 0:
+                write -= 1
+                if write != i:
+                    for name in FIELDS:
+                        arr = getattr(self, name)
+                        arr[write] = arr[i]
+        removed = write - head
+        self.head = write
+        self.count -= removed
+        return removed
+
+    def nearby(self, left, right, hitbox_scale):
+        head = self.head
+        x = self.x[head : head + self.count]
+        reach = self.max_w * hitbox_scale / 2
+        lo = int(x.searchsorted(left - reach, "left"))
+        hi = int(x.searchsorted(right + reach, "right"))
+        return head + lo, head + hi
+
+    def sweep(self, left, right, half_h, player, now, dt, hitbox_scale):
+        # The player's x-extent is fixed, obstacles slide left at constant
+        # speed and the player's y is monotone within a tick, so the y-range
+        # covered while the x-extents overlap decides the hit exactly.
+        # `player` provides y_at(t) and the array form ys_at(ts).
+        lo, hi = self.nearby(left - self.max_speed * dt, right, hitbox_scale)
+        if lo == hi:
+            return False
+        if hi - lo <= SCALAR_SWEEP_LIMIT:
+            return self._sweep_scalar(lo, hi, left, right, half_h, player, now, dt, hitbox_scale)
+        x = self.x[lo:hi]
+        y = self.y[lo:hi]
+        ob_half_w = self.w[lo:hi] * (hitbox_scale / 2)
+        ob_half_h = self.h[lo:hi] * (hitbox_scale / 2)
+        speed = np.maximum(self.speed[lo:hi], 1e-9)
+
+        # Seconds before `now` at which the x-extents start and stop touching.
+        since_enter = np.minimum((right + ob_half_w - x) / speed, dt)
+        since_exit = np.maximum((left - ob_half_w - x) / speed, 0.0)
+        touching = since_exit <= since_enter
+        if not touching.any():
+            return False
+
+        y_enter = player.ys_at(now - since_enter[touching])
+        y_exit = player.ys_at(now - since_exit[touching])
+        player_bottom = np.minimum(y_enter, y_exit) - half_h
+        player_top = np.maximum(y_enter, y_exit) + half_h
+        y = y[touching]
+        ob_half_h = ob_half_h[touching]
+        hit = (player_top >= y - ob_half_h) & (player_bottom <= y + ob_half_h)
+        return bool(hit.any())
+
+    def _sweep_scalar(self, lo, hi, left, right, half_h, player, now, dt, hitbox_scale):
+        # Same test one candidate at a time: a handful of float operations
+        # beats allocating a dozen tiny arrays every tick.
+        for i in range(lo, hi):
+            x = float(self.x[i])
+            ob_half_w = float(self.w[i]) * (hitbox_scale / 2)
+            speed = max(float(self.speed[i]), 1e-9)
+            since_enter = min((right + ob_half_w - x) / speed, dt)
+            since_exit = max((left - ob_half_w - x) / speed, 0.0)
+            if since_exit > since_enter:
+                continue
+            y_enter = player.y_at(now - since_enter)
+            y_exit = player.y_at(now - since_exit)
+            y = float(self.y[i])
+            ob_half_h = float(self.h[i]) * (hitbox_scale / 2)
+            if max(y_enter, y_exit) + half_h >= y - ob_half_h and min(y_enter, y_exit) - half_h <= y + ob_half_h:
+                return True
+        return False
@@ -0,0 +1,117 @@
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+PHYSICS = 0
+SPAWN = 1
+SCROLL_CULL = 2
+COLLISION = 3
+SAVE = 4
+DRAW_MENU = 5
+DRAW_GAME = 6
+DRAW_PAUSE_OVERLAY = 7
+DRAW_SKINS_MENU = 8
+DRAW_GAME_OVER_OVERLAY = 9
+
+PHASE_NAMES = (
+    "physics",
+    "spawn",
+    "scroll_cull",
+    "collision",
+    "save",
+    "draw_menu",
+    "draw_game",
+    "draw_pause_overlay",
+    "draw_skins_menu",
+    "draw_game_over_overlay",
+)
+
+
+class FrameProfiler:
+    # Hooks are written as `if profiler: profiler.mark(PHASE)` so a disabled
+    # profiler (None) costs one attribute load and a branch per phase.
+    def __init__(self, capacity=600, trace=False, trace_capacity=200000):
+        self.frame_times = np.zeros(capacity)
+        self.phase_times = np.zeros((capacity, len(PHASE_NAMES)))
+        self.index = 0
+        self.filled = 0
+        self.current = [0.0] * len(PHASE_NAMES)
+        self.origin = time.perf_counter()
+        self.last = self.origin
+        self.frame_start = self.origin
+        self.trace = deque(maxlen=trace_capacity) if trace else None
+
+    def begin(self):
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        if self.trace is not None:
+            self.trace.append((phase, self.last, now))
+        self.last = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        i = self.index
+        self.frame_times[i] = now - self.frame_start
+        self.phase_times[i] = self.current
+        self.current = [0.0] * len(PHASE_NAMES)
+        self.frame_start = now
+        self.index = (i + 1) % len(self.frame_times)
+        self.filled = min(self.filled + 1, len(self.frame_times))
+
+    def stats(self):
+        if not self.filled:
+            return None
+        frames = self.frame_times[: self.filled]
+        phases = self.phase_times[: self.filled].mean(axis=0)
+        mean = float(frames.mean())
+        p50, p99 = np.percentile(frames, (50, 99))
+        return {
+            "fps": 1.0 / mean if mean > 0 else 0.0,
+            "p50_ms": float(p50) * 1000,
+            "p99_ms": float(p99) * 1000,
+            "phases_ms": {name: float(phases[i]) * 1000 for i, name in enumerate(PHASE_NAMES)},
+        }
+
+    def write_trace(self, path):
+        events = []
+        for phase, start, end in self.trace or ():
+            events.append(
+                {
+                    "name": PHASE_NAMES[phase],
+                    "cat": "draw" if phase >= DRAW_MENU else "update",
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": 1,
+                    "tid": 1,
+                }
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class StartupProfile:
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.last = self.origin
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.origin
+
+    def report(self):
+        lines = ["time to first frame:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<14} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'total':<14} {(self.last - self.origin) * 1000:8.1f} ms")
+        return "\n".join(lines)
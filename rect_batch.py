@@ -0,0 +1,75 @@
+import numpy as np
+from arcade.gl import BufferDescription
+
+VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+in vec2 in_vert;
+in vec4 in_rect;
+in vec4 in_color;
+
+out vec4 v_color;
+
+void main() {
+    vec2 pos = in_rect.xy + in_vert * in_rect.zw;
+    gl_Position = window.projection * window.view * vec4(pos, 0.0, 1.0);
+    v_color = in_color;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+in vec4 v_color;
+out vec4 out_color;
+
+void main() {
+    out_color = v_color;
+}
+"""
+
+INSTANCE = np.dtype([("rect", np.float32, 4), ("color", np.uint8, 4)])
+
+
+class RectBatch:
+    # Filled axis-aligned rectangles (center x/y, width, height, RGBA) filled
+    # from NumPy columns and drawn with one instanced call, so a frame costs
+    # the same few Python calls whether there are ten or ten thousand.
+    def __init__(self, ctx, capacity=256):
+        self.ctx = ctx
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        corners = np.array([-0.5, -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5], dtype=np.float32)
+        self.quad = ctx.buffer(data=corners)
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.data = np.zeros(capacity, dtype=INSTANCE)
+        self.rects = self.data["rect"]
+        self.colors = self.data["color"]
+        self.instances = self.ctx.buffer(reserve=self.data.nbytes)
+        self.geometry = self.ctx.geometry(
+            [
+                BufferDescription(self.quad, "2f", ["in_vert"]),
+                BufferDescription(self.instances, "4f 4f1", ["in_rect", "in_color"], instanced=True),
+            ],
+            mode=self.ctx.TRIANGLE_STRIP,
+        )
+
+    def reserve(self, count):
+        # Returns (rects, colors) views to fill in place for `count` items.
+        if count > len(self.data):
+            self._allocate(max(count, 2 * len(self.data)))
+        self.count = count
+        return self.rects[:count], self.colors[:count]
+
+    def draw(self):
+        if not self.count:
+            return
+        self.instances.write(self.data[: self.count])
+        self.geometry.render(self.program, instances=self.count)
@@ -0,0 +1,101 @@
+from arcade.camera import Camera2D
+from arcade.gl import geometry
+from arcade.types import LBWH, LRBT
+
+
+class OffscreenTarget:
+    def __init__(self, ctx, size):
+        self.ctx = ctx
+        self.quad = geometry.quad_2d_fs()
+        self.resize(size)
+
+    def resize(self, size):
+        self.size = size
+        self.texture = self.ctx.texture(size, components=4, filter=(self.ctx.LINEAR, self.ctx.LINEAR))
+        self.fbo = self.ctx.framebuffer(color_attachments=[self.texture])
+
+    def activate(self):
+        return self.fbo.activate()
+
+    def clear(self, color):
+        self.fbo.clear(color=color)
+
+    def draw(self):
+        # Opaque copy onto whatever framebuffer is bound; blending would mix
+        # in the target's accumulated alpha.
+        program = self.ctx.utility_textured_quad_program
+        self.texture.use(0)
+        with self.ctx.enabled_only():
+            self.quad.render(program)
+
+
+class ScreenCache:
+    def __init__(self, ctx, size):
+        self.target = OffscreenTarget(ctx, size)
+        self.key = None
+
+    def resize(self, size):
+        if size != self.target.size:
+            self.target.resize(size)
+        self.key = None
+
+    def invalidate(self):
+        self.key = None
+
+    def draw(self, key, background, render):
+        if key != self.key:
+            with self.target.activate():
+                self.target.clear(background)
+                render()
+            self.key = key
+        self.target.draw()
+
+
+class ScaledScreen:
+    # Draws the logical canvas into the letterboxed part of the window. With
+    # a render scale the scene goes to an offscreen target of
+    # scale * logical size first and is stretched onto the window, so the
+    # fill cost follows the scale rather than the window; without one (or
+    # when the sizes match anyway) it draws straight to the window.
+    def __init__(self, ctx, logical_size, render_scale=None):
+        self.ctx = ctx
+        self.logical_size = logical_size
+        self.render_scale = render_scale
+        width, height = logical_size
+        self.camera = Camera2D(
+            position=(width / 2, height / 2), projection=LRBT(-width / 2, width / 2, -height / 2, height / 2)
+        )
+        self.target = None
+        self.viewport = (0, 0, width, height)
+        self.size = logical_size
+
+    def resize(self, viewport):
+        # viewport: the letterboxed area in window framebuffer pixels.
+        self.viewport = viewport
+        if self.render_scale is None:
+            size = viewport[2:]
+        else:
+            width, height = self.logical_size
+            size = (max(1, round(width * self.render_scale)), max(1, round(height * self.render_scale)))
+        self.size = tuple(size)
+        if self.size == tuple(viewport[2:]):
+            self.target = None
+        elif self.target is None:
+            self.target = OffscreenTarget(self.ctx, self.size)
+        elif self.target.size != self.size:
+            self.target.resize(self.size)
+
+    def draw(self, background, render):
+        if self.target is None:
+            self.ctx.screen.clear(color=background, viewport=self.viewport)
+            self.camera.viewport = LBWH(*self.viewport)
+            self.camera.use()
+            render()
+            return
+        with self.target.activate():
+            self.target.clear(background)
+            self.camera.viewport = LBWH(0, 0, *self.size)
+            self.camera.use()
+            render()
+        self.ctx.viewport = self.viewport
+        self.target.draw()
@@ -0,0 +1,155 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+from difficulty import MODE_NAMES
+from simulation import FLIP, Simulation
+
+MAGIC = b"SCRP"
+VERSION = 2
+HEADER = struct.Struct("<4sBHQIIIB")
+HEADER_V1 = struct.Struct("<4sBHQIII")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    def __init__(self, seed, tick_rate, flips, final_tick, score, mode="classic"):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.flips = flips
+        self.final_tick = final_tick
+        self.score = score
+        self.mode = mode
+
+    @classmethod
+    def from_simulation(cls, sim):
+        return cls(sim.seed, sim.tick_rate, list(sim.flip_ticks), sim.tick, sim.score, sim.mode)
+
+    def encode(self):
+        mode = MODE_NAMES.index(self.mode)
+        out = bytearray(
+            HEADER.pack(MAGIC, VERSION, self.tick_rate, self.seed, len(self.flips), self.final_tick, self.score, mode)
+        )
+        previous = 0
+        for tick in self.flips:
+            _write_varint(out, tick - previous)
+            previous = tick
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < HEADER_V1.size or data[:4] != MAGIC:
+            raise ValueError("not a StickyCubes replay")
+        version = data[4]
+        if version == 1:
+            magic, version, tick_rate, seed, count, final_tick, score = HEADER_V1.unpack_from(data)
+            mode = 0
+            pos = HEADER_V1.size
+        elif version == VERSION:
+            if len(data) < HEADER.size:
+                raise ValueError("replay file is truncated")
+            magic, version, tick_rate, seed, count, final_tick, score, mode = HEADER.unpack_from(data)
+            pos = HEADER.size
+        else:
+            raise ValueError(f"unsupported replay version {version}")
+        if mode >= len(MODE_NAMES):
+            raise ValueError("replay uses an unknown mode")
+        flips = []
+        tick = 0
+        try:
+            for _ in range(count):
+                delta, pos = _read_varint(data, pos)
+                tick += delta
+                flips.append(tick)
+        except IndexError:
+            raise ValueError("replay file is truncated") from None
+        return cls(seed, tick_rate, flips, final_tick, score, MODE_NAMES[mode])
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
+
+
+def numbered_path(path, number):
+    # runs.scr -> runs-0001.scr
+    base, ext = os.path.splitext(path)
+    return f"{base}-{number:04d}{ext}"
+
+
+def next_free_number(path):
+    number = 1
+    while os.path.exists(numbered_path(path, number)):
+        number += 1
+    return number
+
+
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.index = 0
+
+    def rewind(self):
+        self.index = 0
+
+    def inputs_for(self, tick):
+        flips = self.replay.flips
+        if self.index < len(flips) and flips[self.index] == tick:
+            self.index += 1
+            return (FLIP,)
+        return ()
+
+
+def simulate(replay):
+    sim = Simulation(tick_rate=replay.tick_rate, mode=replay.mode)
+    sim.reset(seed=replay.seed)
+    sim.playback = ReplayPlayer(replay)
+    while sim.tick < replay.final_tick and not sim.crashed:
+        sim.step(sim.tick_dt)
+    return sim
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate a StickyCubes replay headless.")
+    parser.add_argument("path", help="replay file to check")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    sim = simulate(replay)
+    elapsed = time.perf_counter() - start
+
+    ok = sim.tick == replay.final_tick and sim.score == replay.score
+    game_time = replay.final_tick / replay.tick_rate
+    print(f"{replay.mode} seed {replay.seed}  ticks {sim.tick}/{replay.final_tick}  score {sim.score}/{replay.score}")
+    print(f"{game_time:.1f} s of play re-simulated in {elapsed * 1000:.1f} ms ({game_time / max(elapsed, 1e-9):.0f}x)")
+    print("OK" if ok else "MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import random
+from enum import Enum, auto
+
+from difficulty import MODES
+from obstacles import ObstacleStore
+from physics import VerticalSolver
+from profiler import COLLISION, PHYSICS, SCROLL_CULL, SPAWN
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+PLAYER_SIZE = 26
+
+OBSTACLE_WIDTH = 30
+OBSTACLE_MIN_HEIGHT = 50
+OBSTACLE_MAX_HEIGHT = 110
+OBSTACLE_SPEED = 120
+OBSTACLE_SPAWN_INTERVAL = 2.4
+
+GRAVITY_TOP_Y = SCREEN_HEIGHT - PLAYER_SIZE / 2 - 10
+GRAVITY_BOTTOM_Y = PLAYER_SIZE / 2 + 10
+PHYSICS_GRAVITY = 1.4
+
+TICK_RATE = 60
+TICK = 1 / TICK_RATE
+MAX_FRAME_TIME = 0.25
+# How long a flip that arrives too early (cooldown, mid-air) stays queued.
+FLIP_BUFFER = 0.12
+
+FLIP = "flip"
+
+
+class GravityDirection(Enum):
+    DOWN = auto()
+    UP = auto()
+
+
+class Simulation:
+    def __init__(self, seed=None, tick_rate=TICK_RATE, mode="classic", flip_buffer=FLIP_BUFFER):
+        self.rng = random.Random(seed)
+        self.mode = mode
+        self.difficulty = MODES[mode]
+        self.collisions = self.difficulty is None or self.difficulty.collisions
+        self.tick_rate = tick_rate
+        self.tick_dt = 1 / tick_rate
+        self.switch_cooldown = 0.35
+        self.hitbox_scale = 0.7
+        self.flip_buffer = flip_buffer
+        self.obstacles = ObstacleStore()
+        self.vertical = VerticalSolver(GRAVITY_BOTTOM_Y, GRAVITY_TOP_Y, PHYSICS_GRAVITY, TICK)
+        self.profiler = None
+        self.playback = None
+        self.flip_ticks = []
+        self.reset()
+
+    def reset(self, seed=None):
+        # Every run gets an explicit seed so it can be recorded and replayed;
+        # without one the next seed is drawn from the current stream.
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.gravity = GravityDirection.DOWN
+        self.player_x = SCREEN_WIDTH // 3
+        self.player_y = GRAVITY_BOTTOM_Y
+        self.vertical.rest(0.0, self.player_y)
+        self.prev_player_y = self.player_y
+        self.obstacles.clear()
+        self.time_since_last_spawn = 0.0
+        self.time_since_switch = 0.0
+        self.score = 0
+        self.speed = None
+        self._apply_difficulty()
+        self.crashed = False
+        self.tick = 0
+        self.time = 0.0
+        self.accumulator = 0.0
+        self.flip_ticks.clear()
+        self.flip_requested = None
+        self.buffered_flips = 0
+        self.dropped_flips = 0
+
+    def step(self, dt, inputs=()):
+        if self.crashed:
+            return
+
+        prof = self.profiler
+        if prof:
+            prof.begin()
+
+        self.tick += 1
+        self.prev_player_y = self.player_y
+
+        if self.playback is not None:
+            inputs = self.playback.inputs_for(self.tick)
+        if FLIP in inputs:
+            self.flip_requested = self.time
+        if self.flip_requested is not None:
+            self._try_requested_flip()
+
+        self.time_since_switch += dt
+
+        self.time += dt
+        self.player_y = self.vertical.y_at(self.time)
+        if prof:
+            prof.mark(PHYSICS)
+
+        self.obstacles.scroll(dt)
+        passed = self.obstacles.cull()
+        if passed:
+            self.score += passed
+            if self.difficulty is not None:
+                self._apply_difficulty()
+        if prof:
+            prof.mark(SCROLL_CULL)
+
+        # Spawning after the scroll places each pair where it is at the end
+        # of this tick; before it, the pair would be scrolled a second time
+        # and the layout would shift with the tick rate.
+        self.time_since_last_spawn += dt
+        while self.time_since_last_spawn >= self.spawn_interval:
+            self.time_since_last_spawn -= self.spawn_interval
+            self.spawn_obstacles_pair(self.time_since_last_spawn)
+        if prof:
+            prof.mark(SPAWN)
+
+        if self.collisions and self._collides(dt):
+            self.crashed = True
+        if prof:
+            prof.mark(COLLISION)
+
+    def will_step(self, elapsed):
+        # Whether advance(elapsed) runs at least one tick.
+        return not self.crashed and self.accumulator + min(elapsed, MAX_FRAME_TIME) >= self.tick_dt
+
+    def advance(self, elapsed, inputs):
+        self.accumulator += min(elapsed, MAX_FRAME_TIME)
+        while self.accumulator >= self.tick_dt and not self.crashed:
+            self.step(self.tick_dt, inputs)
+            inputs.clear()
+            self.accumulator -= self.tick_dt
+        if self.crashed:
+            # Nothing runs after the crash tick, so time left over must not
+            # carry the drawing past it: hold at alpha == 1, the crash itself.
+            self.accumulator = self.tick_dt
+
+    def _apply_difficulty(self):
+        if self.difficulty is None:
+            interval, speed = OBSTACLE_SPAWN_INTERVAL, OBSTACLE_SPEED
+        else:
+            interval, speed = self.difficulty.at(self.score)
+        self.spawn_interval = interval
+        if speed != self.speed:
+            # One scroll speed for everything on screen keeps obstacles in
+            # spawn order, so the store never has to re-sort.
+            self.speed = speed
+            self.obstacles.set_speed(speed)
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.tick_dt
+
+    def _try_requested_flip(self):
+        # A request that cannot flip yet is retried every tick until it
+        # succeeds or is older than flip_buffer, so an early click fires on
+        # the first legal tick. Only the tick that flipped is recorded.
+        if self.flip_gravity():
+            self.flip_ticks.append(self.tick)
+            if self.time > self.flip_requested:
+                self.buffered_flips += 1
+            self.flip_requested = None
+        elif self.time - self.flip_requested >= self.flip_buffer:
+            self.dropped_flips += 1
+            self.flip_requested = None
+
+    def flip_gravity(self):
+        ground_snap = 4
+        on_bottom = abs(self.player_y - GRAVITY_BOTTOM_Y) <= ground_snap
+        on_top = abs(self.player_y - GRAVITY_TOP_Y) <= ground_snap
+        if self.time_since_switch < self.switch_cooldown or not (on_bottom or on_top):
+            return False
+        self.gravity = GravityDirection.UP if self.gravity == GravityDirection.DOWN else GravityDirection.DOWN
+        self.vertical.launch(self.time, 1 if self.gravity == GravityDirection.UP else -1)
+        self.time_since_switch = 0.0
+        return True
+
+    def _collides(self, dt):
+        half_w = PLAYER_SIZE * self.hitbox_scale / 2
+        half_h = PLAYER_SIZE * self.hitbox_scale / 2
+        return self.obstacles.sweep(
+            self.player_x - half_w,
+            self.player_x + half_w,
+            half_h,
+            self.vertical,
+            self.time,
+            dt,
+            self.hitbox_scale,
+        )
+
+    def spawn_obstacles_pair(self, elapsed=0.0):
+        height = self.rng.randint(OBSTACLE_MIN_HEIGHT, OBSTACLE_MAX_HEIGHT)
+        side_top = self.rng.choice([False, True])
+
+        y = SCREEN_HEIGHT - height / 2 if side_top else height / 2
+        x = SCREEN_WIDTH + OBSTACLE_WIDTH / 2 - self.speed * elapsed
+        self.obstacles.append(x, y, OBSTACLE_WIDTH, height, side_top, self.speed)
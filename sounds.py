@@ -0,0 +1,67 @@
+import arcade
+import pyglet
+from pyglet import media
+
+
+class SoundManager:
+    # Each sound is decoded into memory once (on the asset thread) and gets
+    # a fixed pool of players that keep it queued. play() restarts an idle
+    # player or, when every voice is busy, steals the one started longest
+    # ago; nothing is created per call.
+    def __init__(self, assets):
+        self.assets = assets
+        self.specs = {}
+        self.pools = {}
+        self.cursors = {}
+
+    def add(self, name, path, voices=3, volume=1.0):
+        self.specs[name] = (voices, volume)
+        self.assets.load(name, arcade.load_sound, path)
+
+    def update(self):
+        # Players are created on the main thread, once the decoded sound
+        # is ready.
+        for name, (voices, volume) in self.specs.items():
+            if name not in self.pools:
+                sound = self.assets.get(name)
+                if sound is not None:
+                    self.pools[name] = [self._make_voice(sound.source, volume) for _ in range(voices)]
+                    self.cursors[name] = 0
+
+    def _make_voice(self, source, volume):
+        player = media.Player()
+        player.volume = volume
+        player.queue(source)
+
+        def on_eos():
+            # Stay queued and rewound instead of dropping the source, so the
+            # next play() reuses this player and its audio buffers.
+            player.pause()
+            player.seek(0.0)
+            return pyglet.event.EVENT_HANDLED
+
+        player.push_handlers(on_eos=on_eos)
+        return player
+
+    def play(self, name):
+        pool = self.pools.get(name)
+        if pool is None:
+            return False
+        start = self.cursors[name]
+        count = len(pool)
+        for offset in range(count):
+            player = pool[(start + offset) % count]
+            if not player.playing:
+                break
+        else:
+            player = pool[start]
+            player.seek(0.0)
+        self.cursors[name] = (pool.index(player) + 1) % count
+        player.play()
+        return True
+
+    def close(self):
+        for pool in self.pools.values():
+            for player in pool:
+                player.delete()
+        self.pools.clear()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+
+SAVE_SECRET = "sticky_cubes_secret_v1"
+
+
+def encode_save(data):
+    raw = json.dumps(data, separators=(",", ":"), sort_keys=True)
+    checksum = hashlib.sha256((SAVE_SECRET + raw).encode("utf-8")).hexdigest()
+    return checksum + "\n" + raw
+
+
+def read_save(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            first = f.readline().strip()
+            raw = f.read().strip()
+    except OSError:
+        return None
+    if not first or not raw:
+        return None
+    expected = hashlib.sha256((SAVE_SECRET + raw).encode("utf-8")).hexdigest()
+    if expected != first:
+        return None
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return data
+
+
+def write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    try:
+        if isinstance(text, bytes):
+            f = open(tmp_path, "wb")
+        else:
+            f = open(tmp_path, "w", encoding="utf-8")
+        with f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        return False
+    try:
+        dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return True
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+    return True
+
+
+class BackgroundWriter:
+    # One background thread that hands everything submitted since its last
+    # round to _write(), so callers never wait on the disk. _start() runs on
+    # the thread before the first round and _finish() after the last, which
+    # close() waits for.
+    def __init__(self, name):
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _submit(self, item):
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.append(item)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        self._start()
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                items = self._pending
+                self._pending = []
+                closed = self._closed
+            if items:
+                self._write(items)
+            if closed:
+                self._finish()
+                return
+
+    def _start(self):
+        pass
+
+    def _write(self, items):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+
+class SaveWriter(BackgroundWriter):
+    def __init__(self, path):
+        self.path = path
+        super().__init__("save-writer")
+
+    def submit(self, data):
+        self._submit((None, data))
+
+    def submit_file(self, path, contents):
+        # Other whole files, such as replays, are never dropped: each one is
+        # written, in order.
+        self._submit((path, contents))
+
+    def _write(self, items):
+        # Only the newest snapshot matters; an unwritten older one is dropped.
+        snapshots = [data for path, data in items if path is None]
+        if snapshots:
+            write_atomic(self.path, encode_save(snapshots[-1]))
+        for path, contents in items:
+            if path is not None:
+                write_atomic(path, contents)
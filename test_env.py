@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from env import BatchEnv
+from simulation import FLIP, OBSTACLE_MAX_HEIGHT, OBSTACLE_MIN_HEIGHT, Simulation
+
+
+class RecordingBatchEnv(BatchEnv):
+    # Notes every game's obstacle draws so Simulations can be fed the same.
+    def __init__(self, num_envs, seed):
+        super().__init__(num_envs, seed=seed)
+        self.draws = [[] for _ in range(num_envs)]
+
+    def _spawn(self, mask):
+        rows = np.flatnonzero(mask)
+        state = self.rng.bit_generator.state
+        heights = self.rng.integers(OBSTACLE_MIN_HEIGHT, OBSTACLE_MAX_HEIGHT + 1, size=len(rows))
+        tops = self.rng.random(len(rows)) < 0.5
+        self.rng.bit_generator.state = state
+        super()._spawn(mask)
+        for row, height, top in zip(rows, heights, tops):
+            self.draws[row].append((int(height), bool(top)))
+
+
+class ScriptedRandom:
+    # Stands in for Simulation.rng and hands out the batch's draws in order.
+    def __init__(self, draws):
+        self.draws = draws
+        self.side = None
+
+    def seed(self, seed):
+        pass
+
+    def getrandbits(self, bits):
+        return 0
+
+    def randint(self, low, high):
+        height, self.side = self.draws.pop(0)
+        return height
+
+    def choice(self, options):
+        return self.side
+
+
+# 0 lets a cube flip back while still next to the surface it just left.
+@pytest.mark.parametrize("switch_cooldown", [0.35, 0.0])
+def test_batch_env_matches_simulation(switch_cooldown):
+    num_envs = 64
+    env = RecordingBatchEnv(num_envs, seed=0)
+    env.switch_cooldown = switch_cooldown
+    env.reset()
+    sims = []
+    for draws in env.draws:
+        sim = Simulation()
+        sim.rng = ScriptedRandom(draws)
+        sim.switch_cooldown = switch_cooldown
+        sim.reset()
+        sims.append(sim)
+
+    rng = np.random.default_rng(1)
+    episodes = 0
+    for _ in range(4000):
+        actions = rng.random(num_envs) < 0.1
+        _, _, terminated, _, info = env.step(actions)
+        for i, sim in enumerate(sims):
+            sim.step(sim.tick_dt, (FLIP,) if actions[i] else ())
+            assert bool(terminated[i]) == sim.crashed, (i, sim.tick)
+            if sim.crashed:
+                assert info["final_score"][i] == sim.score
+                assert info["final_tick"][i] == sim.tick
+                sim.reset()
+                episodes += 1
+            else:
+                assert env.player_y[i] == sim.player_y
+                assert env.score[i] == sim.score
+    assert episodes > 100
@@ -0,0 +1,146 @@
+import os
+import random
+
+import pytest
+
+from history import HEADER, RECORD, HistoryWriter, RunHistory
+from storage import SaveWriter, read_save
+
+
+def fill(history, count, seed=0):
+    rng = random.Random(seed)
+    runs = []
+    for i in range(count):
+        score, skin = rng.randint(0, 60), rng.randint(0, 3)
+        history.record(score, rng.uniform(1, 90), skin, seed=i, timestamp=1_700_000_000 + i)
+        runs.append((i, score, skin))
+    return runs
+
+
+def brute_top(runs, n, skin=None):
+    picked = [(i, score) for i, score, s in runs if skin is None or s == skin]
+    picked.sort(key=lambda r: (-r[1], r[0]))
+    return [i for i, _ in picked[:n]]
+
+
+@pytest.mark.parametrize("reopen", [False, True])
+def test_top_matches_a_full_sort(tmp_path, reopen):
+    path = str(tmp_path / "runs.dat")
+    history = RunHistory(path, top_size=20, skin_top_size=5)
+    runs = fill(history, 500)
+    if reopen:
+        history.close()
+        history = RunHistory(path, top_size=20, skin_top_size=5)
+    # 50 is past what the index keeps, so top() has to fall back to a sort.
+    for n in (10, 20, 50):
+        assert [r["index"] for r in history.top(n)] == brute_top(runs, n)
+        for skin in range(4):
+            assert [r["index"] for r in history.top(n, skin)] == brute_top(runs, n, skin)
+    history.close()
+
+
+def test_index_catches_up_with_runs_appended_after_it(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    history = RunHistory(path, top_size=20)
+    runs = fill(history, 100)
+    history.close()
+    # Appended without writing the index, as after a crash.
+    history = RunHistory(path, top_size=20)
+    rng = random.Random(1)
+    for i in range(100, 150):
+        score = rng.randint(0, 100)
+        history.record(score, 10.0, 0, seed=i)
+        runs.append((i, score, 0))
+    history._close_file()
+    history = RunHistory(path, top_size=20)
+    assert len(history) == 150
+    assert [r["index"] for r in history.top(20)] == brute_top(runs, 20)
+    history.close()
+
+
+def test_reopening_after_a_torn_append_keeps_the_count(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    history = RunHistory(path)
+    fill(history, 30)
+    history.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD.size // 2))
+    history = RunHistory(path)
+    assert len(history) == 30
+    assert os.path.getsize(path) == HEADER.size + 30 * RECORD.size
+    history.record(5, 1.0, 0)
+    history.close()
+    assert len(RunHistory(path)) == 31
+
+
+def test_a_broken_header_is_set_aside(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    with open(path, "wb") as f:
+        f.write(b"not a history at all")
+    history = RunHistory(path)
+    assert len(history) == 0
+    assert os.path.exists(path + ".bad")
+    history.close()
+
+
+def test_corrupt_record_is_skipped_then_dropped_by_compact(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    history = RunHistory(path)
+    runs = fill(history, 40)
+    history.close()
+    best = brute_top(runs, 1)[0]
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size + best * RECORD.size + 16)
+        f.write(b"\xff\xff\xff\xff")
+
+    history = RunHistory(path)
+    assert history.run(best) is None
+    rest = [r for r in runs if r[0] != best]
+    assert [r["index"] for r in history.top(5)] == brute_top(rest, 5)
+
+    assert history.compact() == 39
+    assert len(history) == 39
+    assert all(history.run(i) is not None for i in range(39))
+    scores = sorted((score for _, score, _ in rest), reverse=True)
+    assert [r["score"] for r in history.top(5)] == scores[:5]
+    history.close()
+
+
+def test_compact_keeps_recent_and_ranked_runs(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    history = RunHistory(path, top_size=5, skin_top_size=2)
+    runs = fill(history, 200)
+    ranked = set(brute_top(runs, 5))
+    for skin in range(4):
+        ranked.update(brute_top(runs, 2, skin))
+    kept_seeds = sorted(ranked | set(range(190, 200)))
+
+    assert history.compact(keep_recent=10) == len(kept_seeds)
+    assert [history.run(i)["seed"] for i in range(len(history))] == kept_seeds
+    history.close()
+
+
+def test_history_writer_records_every_run(tmp_path):
+    path = str(tmp_path / "runs.dat")
+    writer = HistoryWriter(path)
+    for score in range(25):
+        writer.submit(score, 2.0, 1, "endless", seed=score)
+    writer.close()
+    history = RunHistory(path)
+    assert len(history) == 25
+    assert history.top(1)[0]["score"] == 24
+    assert history.run(3)["mode"] == "endless"
+    history.close()
+
+
+def test_save_writer_keeps_the_newest_save_and_every_file(tmp_path):
+    save_path = str(tmp_path / "save.dat")
+    writer = SaveWriter(save_path)
+    for coins in range(50):
+        writer.submit({"coins": coins})
+        writer.submit_file(str(tmp_path / f"file-{coins}"), bytes([coins]))
+    writer.close()
+    assert read_save(save_path) == {"coins": 49}
+    for coins in range(50):
+        with open(tmp_path / f"file-{coins}", "rb") as f:
+            assert f.read() == bytes([coins])
@@ -0,0 +1,135 @@
+import random
+import statistics
+import tracemalloc
+
+import pytest
+
+import obstacles
+import physics
+import simulation
+from simulation import FLIP, Simulation
+
+GAME_FILES = [tracemalloc.Filter(True, module.__file__) for module in (simulation, obstacles, physics)]
+# Ticks are not allocation-free, only bounded: slicing the live window and
+# reading single elements still create short-lived NumPy views and scalars.
+# The limits count those in NumPy slice views, measured on the running
+# build, rather than in bytes. A per-tick list of records goes over them.
+TYPICAL_TICK_VIEWS = 4
+WORST_TICK_VIEWS = 16
+
+
+def play_until_restart(sim, rng, ticks):
+    # Plays at least `ticks` ticks, restarting after every crash, and stops
+    # right after a restart.
+    restarts = 0
+    played = 0
+    while True:
+        if sim.crashed:
+            sim.reset()
+            restarts += 1
+            if played >= ticks:
+                return restarts
+        sim.step(sim.tick_dt, (FLIP,) if rng.random() < 0.03 else ())
+        played += 1
+
+
+def traced(snapshot):
+    return sum(stat.size for stat in snapshot.filter_traces(GAME_FILES).statistics("filename"))
+
+
+def test_long_run_does_not_grow_memory():
+    rng = random.Random(0)
+    sim = Simulation(seed=1)
+    # Warm up until the arrays are at their working size.
+    play_until_restart(sim, rng, 5000)
+    store = sim.obstacles
+    arrays = [store.x, store.y, store.w, store.h, store.top, store.speed]
+
+    tracemalloc.start()
+    try:
+        # One traced run first, so every piece of per-run state on both
+        # sides of the comparison was allocated while tracing.
+        play_until_restart(sim, rng, 1000)
+        before = traced(tracemalloc.take_snapshot())
+        restarts = play_until_restart(sim, rng, 30000)
+        after = traced(tracemalloc.take_snapshot())
+    finally:
+        tracemalloc.stop()
+
+    assert restarts > 10
+    assert after - before <= 0
+    assert all(a is b for a, b in zip([store.x, store.y, store.w, store.h, store.top, store.speed], arrays))
+
+
+def view_size():
+    # What tracemalloc sees for one slice view of an obstacle column.
+    # Measured the same way as a tick, as the peak over what was traced.
+    x = obstacles.ObstacleStore().x
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        x[1:10]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - current
+
+
+def test_ticks_allocate_a_bounded_amount():
+    view = view_size()
+    rng = random.Random(3)
+    sim = Simulation(seed=4)
+    play_until_restart(sim, rng, 5000)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(20000):
+            if sim.crashed:
+                sim.reset()
+            inputs = (FLIP,) if rng.random() < 0.03 else ()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            sim.step(sim.tick_dt, inputs)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+    finally:
+        tracemalloc.stop()
+
+    assert statistics.median(peaks) <= TYPICAL_TICK_VIEWS * view
+    assert max(peaks) <= WORST_TICK_VIEWS * view
+
+
+def test_restart_reuses_the_arrays():
+    sim = Simulation(seed=2)
+    for _ in range(600):
+        sim.step(sim.tick_dt)
+    store = sim.obstacles
+    x = store.x
+    assert len(store)
+    sim.reset()
+    assert len(store) == 0
+    assert store.x is x
+
+
+def crash_time(seed, tick_rate, flips, grid=0.05):
+    # Flips land on multiples of `grid`, which every tested tick rate hits
+    # exactly, and without buffering so they fire on exactly that tick.
+    sim = Simulation(seed=seed, tick_rate=tick_rate, flip_buffer=0)
+    per_slot = round(grid * tick_rate)
+    for k in range(len(flips) * per_slot):
+        sim.step(sim.tick_dt, (FLIP,) if k % per_slot == 0 and flips[k // per_slot] else ())
+        if sim.crashed:
+            return sim.time
+    return None
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_crash_does_not_depend_on_tick_rate(seed):
+    rng = random.Random(seed)
+    flips = [rng.random() < 0.15 for _ in range(600)]
+    times = [crash_time(seed, rate, flips) for rate in (20, 60, 240)]
+    # Each rate reports the contact at the end of its own tick.
+    assert None not in times
+    assert max(times) - min(times) <= 1 / 20 + 1e-9
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from physics import VerticalSolver
+from simulation import (
+    FLIP,
+    GRAVITY_BOTTOM_Y,
+    GRAVITY_TOP_Y,
+    PHYSICS_GRAVITY,
+    TICK,
+    Simulation,
+)
+
+
+class IntegratedPlayer:
+    # The per-tick integration Simulation used before VerticalSolver:
+    # v += g; y += v, stop at the floor or ceiling, snap within 2 px.
+    def __init__(self):
+        self.up = False
+        self.y = GRAVITY_BOTTOM_Y
+        self.vy = 0.0
+        self.time_since_switch = 0.0
+
+    def step(self, flip, switch_cooldown=0.35, dt=TICK):
+        flipped = False
+        on_surface = abs(self.y - GRAVITY_BOTTOM_Y) <= 4 or abs(self.y - GRAVITY_TOP_Y) <= 4
+        if flip and self.time_since_switch >= switch_cooldown and on_surface:
+            self.up = not self.up
+            self.time_since_switch = 0.0
+            flipped = True
+        self.time_since_switch += dt
+
+        if self.up:
+            self.vy += PHYSICS_GRAVITY
+            target = GRAVITY_TOP_Y
+        else:
+            self.vy -= PHYSICS_GRAVITY
+            target = GRAVITY_BOTTOM_Y
+        self.y += self.vy
+        if self.y <= GRAVITY_BOTTOM_Y or self.y >= GRAVITY_TOP_Y:
+            self.y = min(max(self.y, GRAVITY_BOTTOM_Y), GRAVITY_TOP_Y)
+            self.vy = 0.0
+        if abs(self.y - target) <= 2.0:
+            self.y = target
+            self.vy = 0.0
+        return flipped
+
+
+def landing_tick(ys, target):
+    return next(i for i, y in enumerate(ys) if y == target)
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+def test_flip_lands_on_the_same_tick(direction):
+    start, target = (GRAVITY_BOTTOM_Y, GRAVITY_TOP_Y) if direction > 0 else (GRAVITY_TOP_Y, GRAVITY_BOTTOM_Y)
+    solver = VerticalSolver(GRAVITY_BOTTOM_Y, GRAVITY_TOP_Y, PHYSICS_GRAVITY, TICK)
+    solver.rest(0.0, start)
+    solver.launch(0.0, direction)
+
+    player = IntegratedPlayer()
+    player.y = start
+    player.up = direction < 0
+    player.step(True, switch_cooldown=0.0)
+    expected = [player.y]
+    for _ in range(120):
+        player.step(False)
+        expected.append(player.y)
+
+    ys = [solver.y_at((i + 1) * TICK) for i in range(len(expected))]
+    assert landing_tick(ys, target) == landing_tick(expected, target)
+    assert ys == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_flip_and_landing_ticks_match_integration(seed):
+    rng = random.Random(seed)
+    sim = Simulation(seed, flip_buffer=0)
+    sim.collisions = False
+    player = IntegratedPlayer()
+    expected_flips = []
+    for tick in range(1, 3000):
+        flip = rng.random() < 0.1
+        if player.step(flip, sim.switch_cooldown):
+            expected_flips.append(tick)
+        sim.step(sim.tick_dt, (FLIP,) if flip else ())
+        assert sim.player_y == pytest.approx(player.y, abs=1e-9), tick
+    assert sim.flip_ticks == expected_flips
+
+
+@pytest.mark.parametrize("start_up", [False, True])
+def test_flipping_back_right_after_takeoff_stays_on_the_surface(start_up):
+    # With no cooldown a second flip can come while the cube is still within
+    # the flip band of the surface it just left; it must not jump across.
+    sim = Simulation(seed=0, flip_buffer=0)
+    sim.collisions = False
+    sim.switch_cooldown = 0
+    surface = GRAVITY_BOTTOM_Y
+    if start_up:
+        sim.step(sim.tick_dt, (FLIP,))
+        for _ in range(120):
+            sim.step(sim.tick_dt)
+        surface = GRAVITY_TOP_Y
+    assert sim.player_y == surface
+
+    sim.step(sim.tick_dt, (FLIP,))
+    assert 0 < abs(sim.player_y - surface) <= 4
+    sim.step(sim.tick_dt, (FLIP,))
+    assert len(sim.flip_ticks) == 2 + start_up
+    for _ in range(60):
+        sim.step(sim.tick_dt)
+        assert sim.player_y == surface
+
+
+@pytest.mark.parametrize("frame_time", [0.1, 0.25])
+def test_alpha_stops_at_the_crash_tick(frame_time):
+    # At low frame rates one frame runs several ticks; leftover time after
+    # the crash must not push interpolation past it.
+    sim = Simulation(seed=0)
+    inputs = []
+    while not sim.crashed:
+        sim.advance(frame_time, inputs)
+        assert 0 <= sim.alpha <= 1
+    assert sim.alpha == 1
+    sim.advance(frame_time, inputs)
+    assert sim.alpha == 1
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from replay import HEADER, HEADER_V1, MAGIC, Replay, next_free_number, numbered_path, simulate
+from simulation import FLIP, Simulation
+
+
+def play(seed, mode="classic"):
+    rng = random.Random(seed)
+    sim = Simulation(seed, mode=mode)
+    while not sim.crashed and sim.tick < 20000:
+        sim.step(sim.tick_dt, (FLIP,) if rng.random() < 0.05 else ())
+    return sim
+
+
+@pytest.mark.parametrize("mode", ["classic", "endless"])
+def test_encode_decode_round_trip(mode):
+    sim = play(3, mode)
+    replay = Replay.from_simulation(sim)
+    decoded = Replay.decode(replay.encode())
+    assert vars(decoded) == vars(replay)
+    assert decoded.flips == sim.flip_ticks
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_replay_reproduces_the_run(seed):
+    sim = play(seed)
+    replayed = simulate(Replay.decode(Replay.from_simulation(sim).encode()))
+    assert replayed.crashed == sim.crashed
+    assert replayed.tick == sim.tick
+    assert replayed.score == sim.score
+    assert replayed.flip_ticks == sim.flip_ticks
+
+
+def test_version_1_files_load_as_classic():
+    replay = Replay(seed=2**40 + 7, tick_rate=60, flips=[30, 95, 96, 400], final_tick=900, score=4)
+    body = replay.encode()[HEADER.size :]
+    data = HEADER_V1.pack(MAGIC, 1, 60, replay.seed, 4, 900, 4) + body
+    decoded = Replay.decode(data)
+    assert decoded.mode == "classic"
+    assert (decoded.seed, decoded.flips, decoded.final_tick, decoded.score) == (replay.seed, replay.flips, 900, 4)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"XXXX" + bytes(40),
+        MAGIC + bytes([9]) + bytes(40),
+    ],
+)
+def test_bad_files_are_rejected(data):
+    with pytest.raises(ValueError):
+        Replay.decode(data)
+
+
+def test_truncated_flips_are_rejected():
+    data = Replay(1, 60, [10, 20, 30], 100, 0).encode()
+    with pytest.raises(ValueError):
+        Replay.decode(data[:-1])
+
+
+def test_numbering_continues_after_existing_files(tmp_path):
+    path = str(tmp_path / "run.scr")
+    assert numbered_path(path, 7) == str(tmp_path / "run-0007.scr")
+    assert next_free_number(path) == 1
+    for number in (1, 2):
+        Replay(number, 60, [], 10, 0).save(numbered_path(path, number))
+    assert next_free_number(path) == 3
+    assert Replay.load(numbered_path(path, 2)).seed == 2